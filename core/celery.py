@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
@@ -7,3 +8,9 @@ app = Celery("core")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
+
+@worker_process_shutdown.connect
+def flush_kafka_producer(**kwargs):
+    # Prefork children may exit without running atexit hooks
+    from events.kafka import close_producer
+    close_producer()
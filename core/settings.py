@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from urllib.parse import urlparse
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -32,6 +33,7 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "events.middleware.DecompressIngestBodyMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -65,12 +67,25 @@ CHANNEL_LAYERS = {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
             "hosts": [os.environ.get("REDIS_URL", "redis://localhost:6379/0")],
-            "capacity": 300,  # Maximum messages in channel
+            "capacity": int(os.environ.get("CHANNEL_LAYER_CAPACITY", "300")),  # Maximum messages in channel
             "expiry": 60,     # Message expiry in seconds
         },
     },
 }
 
+# Live stream fanout: events are coalesced per project for this many ms into one
+# channel layer message (0 sends each ingest batch immediately). A window with
+# more than WS_FANOUT_MAX_EVENTS events sends the newest ones plus a summary.
+WS_FANOUT_WINDOW_MS = int(os.environ.get("WS_FANOUT_WINDOW_MS", "150"))
+WS_FANOUT_MAX_EVENTS = int(os.environ.get("WS_FANOUT_MAX_EVENTS", "100"))
+# Per-connection backpressure: each socket gets a send queue of this many frames,
+# drained at most WS_CONNECTION_MAX_MESSAGES_PER_SECOND times a second (queued
+# batches are merged). On overflow "summarize" folds the backlog into a summary
+# frame, "drop_oldest" drops the oldest frame; clients get "lag" frames.
+WS_CONNECTION_QUEUE_DEPTH = int(os.environ.get("WS_CONNECTION_QUEUE_DEPTH", "50"))
+WS_CONNECTION_MAX_MESSAGES_PER_SECOND = float(os.environ.get("WS_CONNECTION_MAX_MESSAGES_PER_SECOND", "10"))
+WS_OVERFLOW_POLICY = os.environ.get("WS_OVERFLOW_POLICY", "summarize")
+
 # WebSocket settings
 if DEBUG:
     import logging
@@ -126,8 +141,14 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    # orjson-backed drop-ins for the stock JSON parser/renderer
+    "DEFAULT_PARSER_CLASSES": [
+        "events.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "events.renderers.ORJSONRenderer",
     ],
 }
 
@@ -142,6 +163,10 @@ if not CORS_ALLOW_ALL_ORIGINS:
         ).split(",")
         if o
     ]
+# Browser SDKs may send compressed ingest bodies
+from corsheaders.defaults import default_headers
+
+CORS_ALLOW_HEADERS = (*default_headers, "content-encoding")
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", REDIS_URL)
@@ -149,6 +174,84 @@ CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", REDIS_URL)
 
 # Rate limit settings
 RATE_LIMIT_EVENTS_PER_MINUTE = int(os.environ.get("RATE_LIMIT_EVENTS_PER_MINUTE", "120"))
+# "sliding" (sliding window counter), "token_bucket", "fixed" (legacy fixed window)
+# or "local" (per-process quota leases synced to Redis in batches)
+RATE_LIMIT_ALGORITHM = os.environ.get("RATE_LIMIT_ALGORITHM", "sliding")
+RATE_LIMIT_LOCAL_SYNC_MS = int(os.environ.get("RATE_LIMIT_LOCAL_SYNC_MS", "250"))
+RATE_LIMIT_LOCAL_LEASE_FRACTION = float(os.environ.get("RATE_LIMIT_LOCAL_LEASE_FRACTION", "0.05"))
+RATE_LIMIT_LOCAL_MAX_OVERSHOOT = float(os.environ.get("RATE_LIMIT_LOCAL_MAX_OVERSHOOT", "0.05"))
+# Spike protection: past the limit, sample events (rate = limit / offered load,
+# floored at SPIKE_MIN_SAMPLE_RATE) instead of answering 429
+SPIKE_PROTECTION = os.environ.get("SPIKE_PROTECTION", "0") == "1"
+SPIKE_MIN_SAMPLE_RATE = float(os.environ.get("SPIKE_MIN_SAMPLE_RATE", "0.01"))
+# Every kept event counts 1 / rate, so the floor must stay positive; queued
+# rates are written with 6 decimals, hence the 1e-6 lower bound
+if not SPIKE_MIN_SAMPLE_RATE > 0:
+    raise ImproperlyConfigured("SPIKE_MIN_SAMPLE_RATE must be greater than 0")
+SPIKE_MIN_SAMPLE_RATE = min(1.0, max(1e-6, SPIKE_MIN_SAMPLE_RATE))
+
+# Envelope (batch) ingest: maximum events accepted per request
+ENVELOPE_MAX_EVENTS = int(os.environ.get("ENVELOPE_MAX_EVENTS", "1000"))
+
+# Compressed ingest bodies (Content-Encoding gzip/deflate/zstd): cap on the
+# decompressed size, enforced while streaming
+INGEST_MAX_DECOMPRESSED_BYTES = int(os.environ.get("INGEST_MAX_DECOMPRESSED_BYTES", str(20 * 1024 * 1024)))
+
+# Client event_id deduplication: retries of an event_id seen within this many
+# seconds are dropped before any DB write (0 disables)
+EVENT_DEDUP_TTL = int(os.environ.get("EVENT_DEDUP_TTL", "3600"))
+
+# Ingest mode: "sync" processes events in the request; "queue" appends the raw
+# payload to a Redis stream, returns 202 and leaves processing to
+# `manage.py run_ingest_worker`.
+INGEST_MODE = os.environ.get("INGEST_MODE", "sync")
+INGEST_QUEUE_MAXLEN = int(os.environ.get("INGEST_QUEUE_MAXLEN", "1000000"))
+# Entries reclaimed after this many failed deliveries go to the `ingest:dead` stream
+INGEST_QUEUE_MAX_DELIVERIES = int(os.environ.get("INGEST_QUEUE_MAX_DELIVERIES", "5"))
+# Serve token ingest and envelope endpoints from native async views on the
+# ASGI event loop (async ORM, asyncio Redis client) instead of sync views
+INGEST_ASYNC = os.environ.get("INGEST_ASYNC", "0") == "1"
+
+# In-process project resolution cache (ingest token / slug -> Project)
+PROJECT_CACHE_SIZE = int(os.environ.get("PROJECT_CACHE_SIZE", "1024"))
+PROJECT_CACHE_TTL = float(os.environ.get("PROJECT_CACHE_TTL", "60"))
+PROJECT_CACHE_NEGATIVE_TTL = float(os.environ.get("PROJECT_CACHE_NEGATIVE_TTL", "10"))
+
+# In-process release id cache ((project, version, environment) -> release id)
+RELEASE_CACHE_SIZE = int(os.environ.get("RELEASE_CACHE_SIZE", "4096"))
+RELEASE_CACHE_TTL = float(os.environ.get("RELEASE_CACHE_TTL", "300"))
+
+# LRU of raw message -> normalized message used for grouping
+GROUPING_NORMALIZE_CACHE_SIZE = int(os.environ.get("GROUPING_NORMALIZE_CACHE_SIZE", "8192"))
+# Grouping strategy for new events: "message:1" (level + normalized message) or
+# "stacktrace:1" (in-app frames after symbolication, message as fallback)
+GROUPING_CONFIG = os.environ.get("GROUPING_CONFIG", "message:1")
+# Compiled per-project fingerprint rules are cached per worker; edits apply at
+# once in the worker that saved them and within this many seconds elsewhere
+FINGERPRINT_RULES_CACHE_TTL = float(os.environ.get("FINGERPRINT_RULES_CACHE_TTL", "30"))
+
+# Near-duplicate group index (MinHash/LSH, see events/similarity.py): every
+# GROUP_SIMILARITY_INDEX_SECONDS the beat task signs up to
+# GROUP_SIMILARITY_BATCH_SIZE new groups and suggests a merge into an older
+# group at GROUP_SIMILARITY_THRESHOLD, or merges automatically at
+# GROUP_SIMILARITY_AUTO_MERGE_THRESHOLD (0 disables auto-merge)
+GROUP_SIMILARITY_ENABLED = os.environ.get("GROUP_SIMILARITY_ENABLED", "0") == "1"
+GROUP_SIMILARITY_THRESHOLD = float(os.environ.get("GROUP_SIMILARITY_THRESHOLD", "0.8"))
+GROUP_SIMILARITY_AUTO_MERGE_THRESHOLD = float(os.environ.get("GROUP_SIMILARITY_AUTO_MERGE_THRESHOLD", "0"))
+GROUP_SIMILARITY_INDEX_SECONDS = float(os.environ.get("GROUP_SIMILARITY_INDEX_SECONDS", "60"))
+GROUP_SIMILARITY_BATCH_SIZE = int(os.environ.get("GROUP_SIMILARITY_BATCH_SIZE", "500"))
+
+# Per-group storage throttling: store the first GROUP_STORE_MAX_EVENTS events of
+# a group per GROUP_STORE_BUCKET_SECONDS (plus every GROUP_STORE_SAMPLE_EVERY-th
+# after that) as full rows; the rest only bump counters (0 disables)
+GROUP_STORE_MAX_EVENTS = int(os.environ.get("GROUP_STORE_MAX_EVENTS", "0"))
+GROUP_STORE_BUCKET_SECONDS = int(os.environ.get("GROUP_STORE_BUCKET_SECONDS", "60"))
+GROUP_STORE_SAMPLE_EVERY = int(os.environ.get("GROUP_STORE_SAMPLE_EVERY", "0"))
+
+# Buffer Group.count/last_seen increments in Redis and flush them in batched
+# UPDATEs every GROUP_COUNTER_FLUSH_SECONDS instead of updating the row per event
+GROUP_COUNTER_BUFFER = os.environ.get("GROUP_COUNTER_BUFFER", "0") == "1"
+GROUP_COUNTER_FLUSH_SECONDS = float(os.environ.get("GROUP_COUNTER_FLUSH_SECONDS", "5"))
 
 # Celery beat schedule
 from celery.schedules import crontab
@@ -157,7 +260,15 @@ CELERY_BEAT_SCHEDULE = {
     "cleanup-old-events-daily": {
         "task": "events.tasks.cleanup_old_events",
         "schedule": crontab(hour=3, minute=0),
-    }
+    },
+    "flush-group-counters": {
+        "task": "events.tasks.flush_group_counters",
+        "schedule": GROUP_COUNTER_FLUSH_SECONDS,
+    },
+    "index-group-similarity": {
+        "task": "events.tasks.index_group_similarity",
+        "schedule": GROUP_SIMILARITY_INDEX_SECONDS,
+    },
 }
 
 # Email backend (console by default). Configure SMTP via env if needed.
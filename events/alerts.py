@@ -5,9 +5,11 @@ from typing import Optional
 import requests
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db.models import ExpressionWrapper, F, FloatField, Sum, Value
 from django.utils import timezone
 
 from .models import Event, AlertRule, Group, AlertState, AlertTarget
+from .throttle import throttle_enabled, windowed_count
 
 
 def _should_trigger(rule: AlertRule, group: Group, event: Event) -> bool:
@@ -22,7 +24,16 @@ def _should_trigger(rule: AlertRule, group: Group, event: Event) -> bool:
     # Windowed count within threshold window
     window_minutes = rule.threshold_window_minutes or 5
     since = timezone.now() - timedelta(minutes=window_minutes)
-    recent_count = group.events.filter(received_at__gte=since).count()
+    if throttle_enabled():
+        # Stored rows undercount throttled groups; the throttle counters are exact.
+        # Events counted before a merge stay under the merged groups' fingerprints.
+        fingerprints = [group.fingerprint, *group.merged_groups.values_list("fingerprint", flat=True)]
+        recent_count = windowed_count(group.project_id, fingerprints, since)
+    else:
+        # Sampled events stand for 1 / sample_rate events each
+        recent_count = round(group.events.filter(received_at__gte=since).aggregate(
+            n=Sum(ExpressionWrapper(Value(1.0) / F("sample_rate"), output_field=FloatField()))
+        )["n"] or 0)
     if recent_count < rule.threshold_count:
         return False
     # Per-group state
@@ -5,3 +5,5 @@ class EventsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "events"
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """Small thread-safe LRU mapping whose entries expire after ``ttl`` seconds.
+    ``None`` is a valid cached value; use ``MISSING`` to tell a miss apart.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def discard_where(self, predicate):
+        """Drop every entry whose value matches ``predicate``."""
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -48,6 +48,8 @@ def query_session_series(project: str, minutes: int = 1440, bucket: str = '5m'):
     return get_client().query(sql, parameters={"project": project, "minutes": minutes}).result_rows
 
 
+# Sampled events are published once with their sample_rate; event counts sum
+# 1 / sample_rate so series and top groups estimate the real volume.
 def query_events_series_by_level(project: str, minutes: int = 60, bucket: str = '5m', from_iso: str | None = None, to_iso: str | None = None, environment: str | None = None):
     client = get_client()
     # Determine granularity function
@@ -62,7 +64,7 @@ def query_events_series_by_level(project: str, minutes: int = 60, bucket: str =
     
     if from_iso and to_iso:
         sql = f"""
-            SELECT {trunc}(toDateTime(received_at)) AS bucket, level, count() AS c
+            SELECT {trunc}(toDateTime(received_at)) AS bucket, level, round(sum(1 / sample_rate)) AS c
             FROM sentry.events
             WHERE project = %(project)s
               AND received_at BETWEEN parseDateTimeBestEffort(%(from)s) AND parseDateTimeBestEffort(%(to)s)
@@ -75,7 +77,7 @@ def query_events_series_by_level(project: str, minutes: int = 60, bucket: str =
             params["environment"] = environment
     else:
         sql = f"""
-            SELECT {trunc}(toDateTime(received_at)) AS bucket, level, count() AS c
+            SELECT {trunc}(toDateTime(received_at)) AS bucket, level, round(sum(1 / sample_rate)) AS c
             FROM sentry.events
             WHERE project = %(project)s AND received_at >= now() - toIntervalMinute(%(minutes)s)
               {env_filter}
@@ -100,7 +102,7 @@ def query_top_groups(project: str, minutes: int = 60, limit: int = 10, from_iso:
     client = get_client()
     if from_iso and to_iso:
         sql = """
-            SELECT fingerprint, any(title) AS title, count() AS c
+            SELECT fingerprint, any(title) AS title, round(sum(1 / sample_rate)) AS c
             FROM sentry.events
             WHERE project = %(project)s
               AND received_at BETWEEN parseDateTimeBestEffort(%(from)s) AND parseDateTimeBestEffort(%(to)s)
@@ -111,7 +113,7 @@ def query_top_groups(project: str, minutes: int = 60, limit: int = 10, from_iso:
         params = {"project": project, "from": from_iso, "to": to_iso, "limit": limit}
     else:
         sql = """
-            SELECT fingerprint, any(title) AS title, count() AS c
+            SELECT fingerprint, any(title) AS title, round(sum(1 / sample_rate)) AS c
             FROM sentry.events
             WHERE project = %(project)s AND received_at >= now() - toIntervalMinute(%(minutes)s)
             GROUP BY fingerprint
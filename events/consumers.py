@@ -1,19 +1,32 @@
+import asyncio
 import json
+import time
+
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from events.models import Project
+from events.projects import get_project_by_slug
+from events.stream_filters import MATCH_ALL, parse_filters
+from events.stream_queue import SendQueue
 
 
 class EventStreamConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.project_slug = self.scope['url_route']['kwargs']['project_slug']
         self.project_group_name = f"events_{self.project_slug}"
+        # Replaced by a "subscribe" message; applied before events are serialized
+        self.filters = MATCH_ALL
+        self.writer = None
         
         # Verify project exists
         project_exists = await self.check_project_exists(self.project_slug)
         if not project_exists:
             await self.close(code=4004)  # Not Found
             return
+
+        # Stream frames go through a bounded queue drained by a writer task
+        self.queue = SendQueue()
+        self.queue_ready = asyncio.Event()
         
         # Join project group
         await self.channel_layer.group_add(
@@ -22,6 +35,7 @@ class EventStreamConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        self.writer = asyncio.create_task(self._drain_queue())
         
         # Send connection confirmation
         await self.send(text_data=json.dumps({
@@ -31,6 +45,8 @@ class EventStreamConsumer(AsyncWebsocketConsumer):
         }))
 
     async def disconnect(self, close_code):
+        if getattr(self, 'writer', None):
+            self.writer.cancel()
         # Leave project group
         if hasattr(self, 'project_group_name'):
             await self.channel_layer.group_discard(
@@ -47,13 +63,58 @@ class EventStreamConsumer(AsyncWebsocketConsumer):
                     'type': 'pong',
                     'timestamp': data.get('timestamp')
                 }))
+            elif data.get('type') == 'subscribe':
+                await self.subscribe(data.get('filters'))
         except json.JSONDecodeError:
             pass
 
+    async def subscribe(self, filters):
+        try:
+            self.filters = parse_filters(filters)
+        except ValueError as e:
+            await self.send(text_data=json.dumps({'type': 'error', 'error': str(e)}))
+            return
+        await self.send(text_data=json.dumps({'type': 'subscribed', 'filters': self.filters.as_dict()}))
+
     # Receive message from project group
     async def new_event(self, event):
-        # Send event to WebSocket
-        await self.send(text_data=json.dumps({
+        if not self.filters.matches(event):
+            return
+        self._enqueue_events([self._event_frame(event)])
+
+    # Receive a coalesced batch of events from project group
+    async def new_events_batch(self, message):
+        # One frame per batch instead of one per event
+        events = [self._event_frame(event) for event in self.filters.apply(message.get('events', []))]
+        if events:
+            self._enqueue_events(events)
+        summary = message.get('summary')
+        if summary:
+            summary = self.filters.apply_summary(summary)
+        if summary:
+            self.queue.push_summary(summary, time.monotonic())
+            self.queue_ready.set()
+
+    def _enqueue_events(self, events):
+        # Handlers never await the socket, so a slow client cannot back up the channel layer
+        self.queue.push_events(events, time.monotonic())
+        self.queue_ready.set()
+
+    async def _drain_queue(self):
+        rate = settings.WS_CONNECTION_MAX_MESSAGES_PER_SECOND
+        interval = 1.0 / rate if rate > 0 else 0
+        while True:
+            await self.queue_ready.wait()
+            self.queue_ready.clear()
+            while len(self.queue):
+                for frame in self.queue.pop_frames(time.monotonic(), settings.WS_FANOUT_MAX_EVENTS):
+                    await self.send(text_data=json.dumps(frame))
+                if interval:
+                    # Frames arriving meanwhile are merged into the next send
+                    await asyncio.sleep(interval)
+
+    def _event_frame(self, event):
+        return {
             'type': 'event',
             'id': event['event_id'],
             'project': event['project'],
@@ -61,13 +122,10 @@ class EventStreamConsumer(AsyncWebsocketConsumer):
             'message': event['message'],
             'timestamp': event['timestamp'],
             'environment': event['environment'],
+            'release': event.get('release'),
             'fingerprint': event.get('fingerprint', '')
-        }))
+        }
 
     @database_sync_to_async
     def check_project_exists(self, project_slug):
-        try:
-            Project.objects.get(slug=project_slug)
-            return True
-        except Project.DoesNotExist:
-            return False
\ No newline at end of file
+        return get_project_by_slug(project_slug) is not None
\ No newline at end of file
@@ -0,0 +1,162 @@
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .cache import MISSING, TTLCache
+from .models import Group
+from .ratelimit import get_redis
+
+
+COUNTS_KEY = "groupbuf:counts"
+LAST_SEEN_KEY = "groupbuf:last_seen"
+FLUSHING_SUFFIX = ":flushing"
+# Held for a whole flush so overlapping runs never apply the same deltas twice
+FLUSH_LOCK_KEY = "groupbuf:flush-lock"
+FLUSH_LOCK_MS = 5 * 60 * 1000
+
+# (project_id, fingerprint) -> group id, so buffered events skip the upsert entirely
+_group_ids = TTLCache(maxsize=10000, ttl=60)
+
+# Move the live buffers aside for flushing. A leftover flushing key means a
+# previous flush died half way; it is drained first and the live buffer waits.
+_SWAP_LUA = """
+if redis.call('EXISTS', KEYS[3]) == 1 or redis.call('EXISTS', KEYS[4]) == 1 then
+  return 1
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then redis.call('RENAME', KEYS[1], KEYS[3]) end
+if redis.call('EXISTS', KEYS[2]) == 1 then redis.call('RENAME', KEYS[2], KEYS[4]) end
+return 0
+"""
+
+# Release the flush lock only if this run still holds it
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+def buffer_enabled() -> bool:
+    return settings.GROUP_COUNTER_BUFFER
+
+
+def cached_group_id(project_id: int, fingerprint: str):
+    gid = _group_ids.get((project_id, fingerprint))
+    return None if gid is MISSING else gid
+
+
+def remember_group_id(project_id: int, fingerprint: str, group_id: int):
+    _group_ids.set((project_id, fingerprint), group_id)
+
+
+def forget_group_id(project_id: int, fingerprint: str):
+    _group_ids.pop((project_id, fingerprint))
+
+
+def record(group_id: int, times: int, seen_at: datetime):
+    """Buffer ``times`` events for a group instead of updating its row."""
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hincrby(COUNTS_KEY, group_id, times)
+    pipe.zadd(LAST_SEEN_KEY, {group_id: seen_at.timestamp()}, gt=True)
+    pipe.execute()
+
+
+def pending_for(group_ids: Iterable[int]) -> Dict[int, tuple]:
+    """Return ``{group_id: (count_delta, last_seen)}`` for buffered groups."""
+    ids = list(group_ids)
+    if not ids:
+        return {}
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hmget(COUNTS_KEY, ids)
+    pipe.zmscore(LAST_SEEN_KEY, ids)
+    deltas, scores = pipe.execute()
+    out = {}
+    for gid, delta, score in zip(ids, deltas, scores):
+        if delta is None:
+            continue
+        last_seen = datetime.fromtimestamp(score, tz=dt_timezone.utc) if score is not None else None
+        out[gid] = (int(delta), last_seen)
+    return out
+
+
+def merge_pending(rows: List[dict]) -> List[dict]:
+    """Add buffered deltas to serialized group rows so counts look live."""
+    pending = pending_for(r["id"] for r in rows)
+    for row in rows:
+        if row["id"] not in pending:
+            continue
+        delta, last_seen = pending[row["id"]]
+        row["count"] = row["count"] + delta
+        current = parse_datetime(row["last_seen"]) if row.get("last_seen") else None
+        if last_seen and (current is None or last_seen > current):
+            row["last_seen"] = last_seen.isoformat().replace("+00:00", "Z")
+    return rows
+
+
+def flush(chunk_size: int = 1000) -> int:
+    """Apply buffered deltas to ``events_group`` in batched UPDATEs.
+    Returns the number of groups updated, or 0 while another flush runs.
+    All chunks commit together; the flushing keys are dropped only after
+    the commit, so a failed flush is retried in full and never half applied.
+    """
+    r = get_redis()
+    token = uuid.uuid4().hex
+    if not r.set(FLUSH_LOCK_KEY, token, nx=True, px=FLUSH_LOCK_MS):
+        return 0
+    try:
+        return _flush_locked(r, chunk_size)
+    finally:
+        r.eval(_UNLOCK_LUA, 1, FLUSH_LOCK_KEY, token)
+
+
+def _flush_locked(r, chunk_size: int) -> int:
+    keys = [COUNTS_KEY, LAST_SEEN_KEY, COUNTS_KEY + FLUSHING_SUFFIX, LAST_SEEN_KEY + FLUSHING_SUFFIX]
+    r.eval(_SWAP_LUA, len(keys), *keys)
+    counts = r.hgetall(keys[2])
+    if not counts:
+        r.delete(keys[2], keys[3])
+        return 0
+    seen = dict(r.zrange(keys[3], 0, -1, withscores=True))
+    rows = []
+    for gid, delta in counts.items():
+        score = seen.get(gid)
+        last_seen = datetime.fromtimestamp(score, tz=dt_timezone.utc) if score is not None else None
+        rows.append((int(gid), int(delta), last_seen))
+
+    table = Group._meta.db_table
+    updated = 0
+    with transaction.atomic(), connection.cursor() as cur:
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            values = ", ".join(["(%s::bigint, %s::integer, %s::timestamptz)"] * len(chunk))
+            params = [Group.STATUS_RESOLVED, Group.STATUS_UNRESOLVED, Group.STATUS_RESOLVED]
+            for row in chunk:
+                params.extend(row)
+            # Deltas buffered for a merged group go to the group it was merged
+            # into. Buffered events newer than the resolution reopen the group.
+            cur.execute(
+                f"""
+                UPDATE {table} AS g SET
+                    count = g.count + v.delta,
+                    last_seen = GREATEST(g.last_seen, COALESCE(v.last_seen, g.last_seen)),
+                    status = CASE WHEN g.status = %s AND v.last_seen > COALESCE(g.resolved_at, '-infinity')
+                                  THEN %s ELSE g.status END,
+                    resolved_at = CASE WHEN g.status = %s AND v.last_seen > COALESCE(g.resolved_at, '-infinity')
+                                       THEN NULL ELSE g.resolved_at END
+                FROM (
+                    SELECT COALESCE(s.merged_into_id, b.id) AS id, SUM(b.delta) AS delta,
+                           MAX(b.last_seen) AS last_seen
+                    FROM (VALUES {values}) AS b(id, delta, last_seen)
+                    LEFT JOIN {table} AS s ON s.id = b.id
+                    GROUP BY 1
+                ) AS v
+                WHERE g.id = v.id
+                """,
+                params,
+            )
+            updated += cur.rowcount
+    r.delete(keys[2], keys[3])
+    return updated
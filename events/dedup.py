@@ -0,0 +1,120 @@
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+
+from .ratelimit import get_async_redis, get_redis
+
+
+# dedup:<project_id>:<event_id> -> "" while the event is being ingested, then
+# the id of the stored Event. Expires after EVENT_DEDUP_TTL seconds.
+KEY_PREFIX = "dedup"
+MAX_EVENT_ID_LENGTH = 64
+
+
+def dedup_enabled() -> bool:
+    return settings.EVENT_DEDUP_TTL > 0
+
+
+def normalize_event_id(value) -> str | None:
+    """Client event ids are usually UUIDs; dashes and case are ignored."""
+    if value is None or isinstance(value, (dict, list, bool)):
+        return None
+    event_id = str(value).strip().lower().replace("-", "")
+    if not event_id or len(event_id) > MAX_EVENT_ID_LENGTH:
+        return None
+    return event_id
+
+
+def _key(project_id: int, event_id: str) -> str:
+    return f"{KEY_PREFIX}:{project_id}:{event_id}"
+
+
+def _queue_claims(pipe, project_id: int, ids: List[str | None]):
+    for event_id in ids:
+        if event_id:
+            pipe.set(_key(project_id, event_id), "", nx=True, ex=settings.EVENT_DEDUP_TTL)
+            pipe.get(_key(project_id, event_id))
+
+
+def _split_claims(payloads: List[dict], ids: List[str | None], replies) -> Tuple[List[dict], List[Dict]]:
+    replies = iter(replies)
+    fresh, duplicates = [], []
+    for payload, event_id in zip(payloads, ids):
+        if not event_id:
+            fresh.append(payload)
+            continue
+        claimed, stored = next(replies), next(replies)
+        if claimed:
+            fresh.append(payload)
+        else:
+            duplicates.append({"event_id": payload.get("event_id"), "id": int(stored) if stored else None})
+    return fresh, duplicates
+
+
+def claim(project_id: int, payloads: List[dict]) -> Tuple[List[dict], List[Dict]]:
+    """Split ``payloads`` into the ones to ingest and the retries to drop.
+
+    Each client ``event_id`` is claimed with ``SET NX EX`` (one pipelined round
+    trip per request); payloads without one are always ingested. Duplicates are
+    returned as ``{"event_id": ..., "id": <original Event id or None>}``, where
+    ``id`` is None while the original is still in flight or queued. If Redis is
+    unavailable, every payload is ingested.
+    """
+    if not dedup_enabled():
+        return payloads, []
+    ids = [normalize_event_id(p.get("event_id")) for p in payloads]
+    if not any(ids):
+        return payloads, []
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        _queue_claims(pipe, project_id, ids)
+        replies = pipe.execute()
+    except Exception as e:
+        print(f"Event dedup unavailable: {e}")
+        return payloads, []
+    return _split_claims(payloads, ids, replies)
+
+
+async def aclaim(project_id: int, payloads: List[dict]) -> Tuple[List[dict], List[Dict]]:
+    """``claim`` for async views, on the asyncio Redis client."""
+    if not dedup_enabled():
+        return payloads, []
+    ids = [normalize_event_id(p.get("event_id")) for p in payloads]
+    if not any(ids):
+        return payloads, []
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        _queue_claims(pipe, project_id, ids)
+        replies = await pipe.execute()
+    except Exception as e:
+        print(f"Event dedup unavailable: {e}")
+        return payloads, []
+    return _split_claims(payloads, ids, replies)
+
+
+def remember(project_id: int, events: Iterable) -> None:
+    """Record the stored Event id for claimed event ids so retries can echo it."""
+    if not dedup_enabled():
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for event in events:
+            event_id = normalize_event_id((event.payload or {}).get("event_id"))
+            if event_id:
+                pipe.set(_key(project_id, event_id), event.id, xx=True, ex=settings.EVENT_DEDUP_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"Event dedup update failed: {e}")
+
+
+def release(project_id: int, payloads: Iterable[dict]) -> None:
+    """Drop claims for payloads that were not stored, so a retry is accepted."""
+    if not dedup_enabled():
+        return
+    keys = [_key(project_id, e) for e in (normalize_event_id(p.get("event_id")) for p in payloads) if e]
+    if not keys:
+        return
+    try:
+        get_redis().delete(*keys)
+    except Exception as e:
+        print(f"Event dedup release failed: {e}")
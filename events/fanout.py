@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+
+# Live-stream fanout coalescing: ingest appends stream events to a per-process
+# buffer and a flusher thread sends at most one channel-layer message per
+# project every WS_FANOUT_WINDOW_MS. A window holding more than
+# WS_FANOUT_MAX_EVENTS events for a project sends only the newest ones plus a
+# summary (count by level) of the rest.
+_lock = threading.Lock()
+_buffer: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+_flusher = None
+_stats = {"published": 0, "messages": 0, "summarized": 0}
+
+
+def coalescing_enabled() -> bool:
+    return settings.WS_FANOUT_WINDOW_MS > 0
+
+
+def _group(project_slug: str) -> str:
+    return f"events_{project_slug}"
+
+
+def build_message(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One ``new_events_batch`` message; overflow becomes a level summary."""
+    keep = events[-settings.WS_FANOUT_MAX_EVENTS:] if settings.WS_FANOUT_MAX_EVENTS > 0 else []
+    message = {"type": "new_events_batch", "events": keep}
+    omitted = events[:len(events) - len(keep)]
+    if omitted:
+        message["summary"] = {
+            "count": len(omitted),
+            "levels": dict(Counter(e.get("level") or "error" for e in omitted)),
+            "since": omitted[0].get("timestamp"),
+            "until": omitted[-1].get("timestamp"),
+        }
+    return message
+
+
+def _take() -> Dict[str, List[Dict[str, Any]]]:
+    global _buffer
+    with _lock:
+        pending, _buffer = _buffer, defaultdict(list)
+    return pending
+
+
+async def _flush(channel_layer) -> None:
+    for project_slug, events in _take().items():
+        message = build_message(events)
+        try:
+            await channel_layer.group_send(_group(project_slug), message)
+        except Exception as e:
+            print(f"❌ [WebSocket] Publish error: {e}")
+            continue
+        with _lock:
+            _stats["messages"] += 1
+            _stats["summarized"] += message.get("summary", {}).get("count", 0)
+
+
+async def _run_flusher() -> None:
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    while True:
+        await asyncio.sleep(settings.WS_FANOUT_WINDOW_MS / 1000.0)
+        if channel_layer is not None:
+            await _flush(channel_layer)
+        else:
+            _take()
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        # Its own event loop, so channel layer connections are reused across flushes
+        _flusher = threading.Thread(target=asyncio.run, args=(_run_flusher(),), name="ws-fanout", daemon=True)
+        _flusher.start()
+
+
+def _buffer_events(project_slug: str, events: List[Dict[str, Any]]) -> None:
+    with _lock:
+        _buffer[project_slug].extend(events)
+        _stats["published"] += len(events)
+    _ensure_flusher()
+
+
+def publish(project_slug: str, events: List[Dict[str, Any]]) -> None:
+    """Send stream events to a project's WebSocket subscribers."""
+    if not events:
+        return
+    if coalescing_enabled():
+        _buffer_events(project_slug, events)
+        return
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        async_to_sync(channel_layer.group_send)(_group(project_slug), {"type": "new_events_batch", "events": events})
+
+
+async def apublish(project_slug: str, events: List[Dict[str, Any]]) -> None:
+    """``publish`` for async views."""
+    if not events:
+        return
+    if coalescing_enabled():
+        _buffer_events(project_slug, events)
+        return
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        await channel_layer.group_send(_group(project_slug), {"type": "new_events_batch", "events": events})
+
+
+def fanout_stats() -> Dict[str, Any]:
+    with _lock:
+        return dict(_stats, buffered=sum(len(v) for v in _buffer.values()), window_ms=settings.WS_FANOUT_WINDOW_MS)
@@ -0,0 +1,172 @@
+import fnmatch
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+from .cache import MISSING, TTLCache
+from .grouping import GROUPING_RULES, exception_type, normalize_message
+from .models import FingerprintRule
+
+
+# Per-project fingerprint rules. A project's active rules compile into one
+# matcher: all rules on the same field share one alternation regex, guarded by
+# a regex of the literal text each rule's glob requires, so events that match
+# no rule (the common case) are rejected by one literal scan per field.
+# Templates are split into literal/variable parts once. Compiled matchers are
+# cached per worker; rule saves and deletes invalidate the current process and
+# other workers converge within FINGERPRINT_RULES_CACHE_TTL.
+FIELDS = ("message", "exception_type", "level", "environment", "release")
+TAG_PREFIX = "tags."
+VARIABLES = ("default", "message", "exception_type", "level", "environment", "release")
+_PLACEHOLDER_RE = re.compile(r"\{([^{}]*)\}")
+_GLOB_WILDCARD_RE = re.compile(r"\*|\?|\[[^\]]*\]?")
+
+# project_id -> CompiledRules, or None for projects without active rules
+_compiled = TTLCache(maxsize=settings.PROJECT_CACHE_SIZE, ttl=settings.FINGERPRINT_RULES_CACHE_TTL)
+
+
+def validate_field(field: str) -> str:
+    if field in FIELDS or (field.startswith(TAG_PREFIX) and len(field) > len(TAG_PREFIX)):
+        return field
+    raise ValueError(f"field must be one of {', '.join(FIELDS)} or {TAG_PREFIX}<name>")
+
+
+def parse_template(template: str) -> Tuple[Tuple[bool, str], ...]:
+    """Split ``template`` into (is_variable, text) parts; ValueError on unknown variables."""
+    parts, pos = [], 0
+    for match in _PLACEHOLDER_RE.finditer(template):
+        name = match.group(1).strip()
+        if name not in VARIABLES and not (name.startswith(TAG_PREFIX) and len(name) > len(TAG_PREFIX)):
+            raise ValueError(f"unknown variable {{{name}}}; use {', '.join(VARIABLES)} or {TAG_PREFIX}<name>")
+        if match.start() > pos:
+            parts.append((False, template[pos:match.start()]))
+        parts.append((True, name))
+        pos = match.end()
+    if pos < len(template):
+        parts.append((False, template[pos:]))
+    return tuple(parts)
+
+
+def _required_literal(pattern: str) -> str:
+    """Longest wildcard-free run of ``pattern``; any value it matches contains it."""
+    return max(_GLOB_WILDCARD_RE.split(pattern), key=len)
+
+
+def tag_value(tags, name: str) -> str:
+    """Look ``name`` up in event tags: a mapping, or a list of "key:value"
+    strings, [key, value] pairs or {"key", "value"} objects."""
+    if isinstance(tags, dict):
+        value = tags.get(name)
+        return "" if value is None else str(value)
+    for tag in tags if isinstance(tags, list) else ():
+        if isinstance(tag, str):
+            key, sep, value = tag.partition(":")
+            if sep and key == name:
+                return value
+        elif isinstance(tag, (list, tuple)) and len(tag) == 2 and tag[0] == name:
+            return str(tag[1])
+        elif isinstance(tag, dict) and tag.get("key") == name:
+            return str(tag.get("value", ""))
+    return ""
+
+
+def field_value(field: str, payload: dict, message: str, level: str, environment: str) -> str:
+    if field == "message":
+        return message or ""
+    if field == "exception_type":
+        return exception_type(message)
+    if field == "level":
+        return level
+    if field == "environment":
+        return environment
+    if field == "release":
+        return str(payload.get("release") or "")
+    return tag_value(payload.get("tags"), field[len(TAG_PREFIX):])
+
+
+class _Rule(NamedTuple):
+    fingerprint: Tuple[Tuple[bool, str], ...]
+    title: Tuple[Tuple[bool, str], ...]
+
+
+class CompiledRules:
+    """Every active rule of one project, ready to match events."""
+
+    def __init__(self, rules: List[FingerprintRule]):
+        self.rules: List[_Rule] = []
+        by_field: Dict[str, List[str]] = {}
+        literals: Dict[str, set] = {}
+        for index, rule in enumerate(rules):
+            self.rules.append(_Rule(parse_template(rule.fingerprint), parse_template(rule.title)))
+            # Case-insensitive: patterns and values are compared lowercased
+            field, pattern = validate_field(rule.field), (rule.pattern or "*").lower()
+            # fnmatch patterns have no capturing groups, so they combine safely
+            by_field.setdefault(field, []).append(f"(?P<r{index}>{fnmatch.translate(pattern)})")
+            literals.setdefault(field, set()).add(_required_literal(pattern))
+        # Alternatives are tried in order: a match names the field's first matching rule.
+        # The guard is None when some rule on the field requires no literal text.
+        self.matchers = [
+            (
+                field,
+                None if "" in literals[field] else re.compile("|".join(map(re.escape, sorted(literals[field])))),
+                re.compile("|".join(alternatives)),
+            )
+            for field, alternatives in by_field.items()
+        ]
+
+    def match(self, payload: dict, message: str, level: str, environment: str) -> Optional[int]:
+        """Index of the first rule matching the event, or None."""
+        best = None
+        for field, guard, regex in self.matchers:
+            value = field_value(field, payload, message, level, environment).lower()
+            if guard is not None and guard.search(value) is None:
+                continue
+            m = regex.match(value)
+            if m is not None:
+                index = int(m.lastgroup[1:])
+                if best is None or index < best:
+                    best = index
+        return best
+
+    def apply(
+        self, payload: dict, message: str, level: str, environment: str, fingerprint: str, title: str, config: str
+    ) -> Tuple[str, str, str]:
+        """The rule-based (fingerprint, title, config), or the given ones when no rule matches."""
+        index = self.match(payload, message, level, environment)
+        if index is None:
+            return fingerprint, title, config
+        rule = self.rules[index]
+
+        def value(name: str) -> str:
+            if name == "default":
+                return fingerprint
+            if name == "message":
+                return normalize_message(message)
+            return field_value(name, payload, message, level, environment)
+
+        def render(parts) -> str:
+            return "".join(value(text) if is_var else text for is_var, text in parts)
+
+        custom_title = render(rule.title)[:255] if rule.title else title
+        return f"rules:{render(rule.fingerprint)}"[:512], custom_title, GROUPING_RULES
+
+
+def rules_for_project(project_id: int) -> Optional[CompiledRules]:
+    """The project's compiled rules, or None when it has no active rules."""
+    compiled = _compiled.get(project_id)
+    if compiled is not MISSING:
+        return compiled
+    rules = list(FingerprintRule.objects.filter(project_id=project_id, active=True).order_by("order", "id"))
+    try:
+        compiled = CompiledRules(rules) if rules else None
+    except (ValueError, re.error) as e:
+        # Rules are validated on save; a bad row must not break ingest
+        print(f"Fingerprint rules error for project {project_id}: {e}")
+        compiled = None
+    _compiled.set(project_id, compiled)
+    return compiled
+
+
+def forget_rules(project_id: int):
+    _compiled.pop(project_id)
@@ -1,22 +1,66 @@
+import hashlib
 import re
-from typing import Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
+from django.conf import settings
 
-_NUMBER_RE = re.compile(r"\b\d+\b")
-_HEX_RE = re.compile(r"\b0x[0-9a-fA-F]+\b")
-_UUID_RE = re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}-[0-9a-fA-F]{12}\b")
-_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+_EMAIL = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+_UUID = r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}-[0-9a-fA-F]{12}\b"
+_HEX = r"0x[0-9a-fA-F]+\b"
+# Emails are replaced before numbers, so a number must stop where an email
+# starts and may end there without a word boundary. Both only happen after a
+# non-ASCII digit (ASCII digits are part of the email's own character run).
+_NUMBER = rf"\d(?:(?<=[0-9])\d|(?![0-9])\d|(?!{_EMAIL})\d)*(?:\b|(?={_EMAIL}))"
+
+# One pass with the same output as substituting email, UUID, hex and number in
+# that order. Replacing an email with "<email>" puts a word boundary after it,
+# so a token glued to the end of an email ("a@b.com42") is replaced with it,
+# unless another email starts there (that pass ran first).
+_TOKEN_RE = re.compile(
+    rf"(?P<email>{_EMAIL})(?:(?!{_EMAIL})(?:(?P<email_uuid>{_UUID})|(?P<email_hex>{_HEX})|(?P<email_n>{_NUMBER})))?"
+    rf"|\b(?:(?P<uuid>{_UUID})|(?P<hex>{_HEX})|(?P<n>{_NUMBER}))"
+)
+# Without an "@" no email can match; trying the email branch at every
+# position is most of the cost, so such messages use the plain token branch
+_TOKEN_NO_EMAIL_RE = re.compile(rf"\b(?:(?P<uuid>{_UUID})|(?P<hex>{_HEX})|(?P<n>\d+\b))")
+
+_REPLACEMENTS = {
+    "email": "<email>",
+    "email_uuid": "<email><uuid>",
+    "email_hex": "<email><hex>",
+    "email_n": "<email><n>",
+    "uuid": "<uuid>",
+    "hex": "<hex>",
+    "n": "<n>",
+}
+
+# Messages longer than this are normalized without being cached
+_CACHEABLE_LENGTH = 2048
+
+
+def _replace(match: re.Match) -> str:
+    # The innermost named group that matched is the last one closed
+    return _REPLACEMENTS[match.lastgroup]
+
+
+def _normalize(message: str) -> str:
+    m = message.strip()
+    token_re = _TOKEN_RE if "@" in m else _TOKEN_NO_EMAIL_RE
+    return token_re.sub(_replace, m)[:500]
+
+
+# Storms repeat identical messages, so most calls are hits
+_normalize_cached = lru_cache(maxsize=settings.GROUPING_NORMALIZE_CACHE_SIZE)(_normalize)
 
 
 def normalize_message(message: str) -> str:
     if not message:
         return ""
-    m = message.strip()
-    m = _EMAIL_RE.sub("<email>", m)
-    m = _UUID_RE.sub("<uuid>", m)
-    m = _HEX_RE.sub("<hex>", m)
-    m = _NUMBER_RE.sub("<n>", m)
-    return m[:500]
+    if len(message) > _CACHEABLE_LENGTH:
+        return _normalize(message)
+    return _normalize_cached(message)
 
 
 def compute_fingerprint(message: str, level: str = "error") -> Tuple[str, str]:
@@ -26,3 +70,97 @@ def compute_fingerprint(message: str, level: str = "error") -> Tuple[str, str]:
     title = normalized[:120] or (message[:120] if message else "event")
     return fingerprint, title
 
+
+# Grouping strategies, "<name>:<version>". Groups record the config that
+# created them; a new version never reuses an older version's fingerprints.
+GROUPING_MESSAGE = "message:1"
+GROUPING_STACKTRACE = "stacktrace:1"
+GROUPING_CONFIGS = (GROUPING_MESSAGE, GROUPING_STACKTRACE)
+# Recorded on groups created by a project's fingerprint rules (fingerprint_rules.py)
+GROUPING_RULES = "rules:1"
+
+# Frames beyond this many in-app frames do not change the group (deep recursion)
+_MAX_GROUPING_FRAMES = 30
+_EXCEPTION_TYPE_RE = re.compile(r"^\s*([A-Za-z_$][\w.$]*)\s*:")
+_URL_PREFIX_RE = re.compile(r"^[a-z][a-z0-9+.-]*://[^/]*", re.IGNORECASE)
+# Build hashes in bundle names: app.3f2a1b9c.js, chunk-5d1e2f3a.js
+_FILE_HASH_RE = re.compile(r"([.-])(?=[0-9a-f]*[0-9])[0-9a-f]{6,}(?=\.)", re.IGNORECASE)
+_NOT_IN_APP = ("/node_modules/", "/site-packages/", "/dist-packages/", "/vendor/", "/lib/python")
+_NOT_IN_APP_PREFIXES = ("node:", "internal/", "<frozen", "webpack/bootstrap")
+
+
+def exception_type(message: str) -> str:
+    """The ``Type`` of a ``Type: detail`` message, else ""."""
+    match = _EXCEPTION_TYPE_RE.match(message or "")
+    return match.group(1) if match else ""
+
+
+def _frame_file(frame: Dict[str, Any]) -> str:
+    path = str(frame.get("orig_file") or frame.get("file") or "")
+    # Scheme and host (also "webpack://"), query and fragment
+    path = _URL_PREFIX_RE.sub("", path).split("?", 1)[0].split("#", 1)[0]
+    return _FILE_HASH_RE.sub(r"\1<hash>", path.lstrip("./"))
+
+
+def is_in_app(frame: Dict[str, Any]) -> bool:
+    """The frame's own ``in_app`` flag, else a guess from its (original) path."""
+    if isinstance(frame.get("in_app"), bool):
+        return frame["in_app"]
+    path = str(frame.get("orig_file") or frame.get("file") or "")
+    if not path or path.startswith(_NOT_IN_APP_PREFIXES):
+        return False
+    return not any(part in "/" + path for part in _NOT_IN_APP)
+
+
+def frame_component(frame: Dict[str, Any]) -> str:
+    module = frame.get("module") or _frame_file(frame)
+    return f"{module}:{frame.get('function') or '<anon>'}"
+
+
+def stacktrace_components(message: str, frames: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """What ``stacktrace:1`` hashes: the exception type, then module (or
+    source file) and function of each in-app frame. Line numbers are left out
+    so unrelated edits in the same file keep the group. Empty without in-app
+    frames."""
+    components: List[str] = []
+    for frame in frames or []:
+        if not isinstance(frame, dict) or not is_in_app(frame):
+            continue
+        component = frame_component(frame)
+        if components and components[-1] == component:
+            continue  # collapse direct recursion
+        components.append(component)
+        if len(components) == _MAX_GROUPING_FRAMES:
+            break
+    if not components:
+        return components
+    return [exception_type(message)] + components
+
+
+def group_event(
+    message: str,
+    level: str = "error",
+    frames: Optional[List[Dict[str, Any]]] = None,
+    config: Optional[str] = None,
+) -> Tuple[str, str, str]:
+    """Return ``(fingerprint, title, grouping config)`` for an event.
+    With ``stacktrace:1`` (GROUPING_CONFIG) events whose (symbolicated) frames
+    include in-app frames group by those frames; everything else falls back to
+    the message fingerprint and records ``message:1``."""
+    config = config or settings.GROUPING_CONFIG
+    if config == GROUPING_STACKTRACE:
+        components = stacktrace_components(message, frames)
+        if components:
+            digest = hashlib.md5("\n".join(components).encode("utf-8"), usedforsecurity=False).hexdigest()
+            normalized = normalize_message(message)
+            title = normalized[:120] or (message[:120] if message else "event")
+            return f"{level}:stack:{digest}", title, GROUPING_STACKTRACE
+    fingerprint, title = compute_fingerprint(message, level)
+    return fingerprint, title, GROUPING_MESSAGE
+
+
+def fingerprint_hash(fingerprint: str) -> bytes:
+    """128-bit group key for ``fingerprint``; the unique index is on
+    (project, hash), so the readable fingerprint itself is not indexed.
+    MD5 so the migration backfill can compute the same value in SQL."""
+    return hashlib.md5(fingerprint.encode("utf-8"), usedforsecurity=False).digest()
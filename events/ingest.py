@@ -0,0 +1,421 @@
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .counters import buffer_enabled, cached_group_id, forget_group_id, record, remember_group_id
+from .dedup import remember as remember_event_ids
+from .fingerprint_rules import rules_for_project
+from .fanout import apublish as apublish_stream, publish as publish_stream
+from .grouping import GROUPING_MESSAGE, GROUPING_STACKTRACE, fingerprint_hash, group_event
+from .kafka import publish_events
+from .models import Event, Group, Project, Release
+from .releases import forget_release_ids, resolve_release_id
+from .sampling import weighted_count
+from .similarity import merged_fingerprints
+from .symbolication import parse_stacktrace, symbolicate_frames_for_release
+from .throttle import plan_storage
+
+
+class EnvelopeError(ValueError):
+    """Raised when an envelope body cannot be decoded into events."""
+
+
+def normalize_level(payload: dict) -> str:
+    """Derive a normalized level from common fields.
+    Priority: payload.level -> payload.severity/severity_text -> payload.extra.level -> payload.extra.severity -> severity_number -> 'error'
+    Maps warn/warning to 'warning'; debug/trace -> 'info'; fatal -> 'error'.
+    """
+    def map_text(v: str | None) -> str | None:
+        if not v:
+            return None
+        t = str(v).strip().lower()
+        if t in {"warn", "warning"}:
+            return "warning"
+        if t in {"err", "error", "fatal"}:
+            return "error"
+        if t in {"info", "log", "notice", "debug", "trace"}:
+            return "info"
+        return t
+
+    level = (
+        map_text(payload.get("level"))
+        or map_text(payload.get("severity"))
+        or map_text(payload.get("severity_text"))
+        or map_text((payload.get("extra") or {}).get("level"))
+        or map_text((payload.get("extra") or {}).get("severity"))
+    )
+    if not level:
+        try:
+            sev_num = int(payload.get("severity_number")) if payload.get("severity_number") is not None else None
+        except Exception:
+            sev_num = None
+        if sev_num is not None:
+            # OpenTelemetry: 1-4 trace, 5-8 debug, 9-12 info, 13-16 warn, 17-20 error, 21-24 fatal
+            if 13 <= sev_num <= 16:
+                level = "warning"
+            elif 17 <= sev_num <= 24:
+                level = "error"
+            else:
+                level = "info"
+    return level or "error"
+
+
+def parse_envelope(body: bytes) -> List[Dict[str, Any]]:
+    """Decode an envelope body into a list of event payloads.
+    Accepts a JSON array, an object with an ``events`` array, a single event
+    object, or NDJSON (one event object per line).
+    """
+    body = (body or b"").strip()
+    if not body:
+        return []
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        # Not a single JSON document: treat as NDJSON
+        data = []
+        for lineno, line in enumerate(body.splitlines(), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data.append(orjson.loads(line))
+            except orjson.JSONDecodeError as e:
+                raise EnvelopeError(f"invalid JSON on line {lineno}: {e.msg}")
+    if isinstance(data, dict):
+        data = data["events"] if isinstance(data.get("events"), list) else [data]
+    if not isinstance(data, list):
+        raise EnvelopeError("envelope must be a JSON array, an object or NDJSON")
+    for item in data:
+        if not isinstance(item, dict):
+            raise EnvelopeError("every envelope item must be a JSON object")
+    return data
+
+
+_GROUP_UPSERT_SQL = None
+
+
+def _group_upsert_sql() -> str:
+    global _GROUP_UPSERT_SQL
+    if _GROUP_UPSERT_SQL is None:
+        table = Group._meta.db_table
+        columns = ", ".join(f.column for f in Group._meta.concrete_fields)
+        _GROUP_UPSERT_SQL = f"""
+            INSERT INTO {table}
+                (project_id, fingerprint, fingerprint_hash, title, level, count, first_seen, last_seen,
+                 status, resolved_at, assignee, is_bookmarked, grouping_config)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NULL, '', FALSE, %s)
+            ON CONFLICT (project_id, fingerprint_hash) DO UPDATE SET
+                count = {table}.count + EXCLUDED.count,
+                last_seen = GREATEST({table}.last_seen, EXCLUDED.last_seen),
+                level = EXCLUDED.level,
+                status = CASE WHEN {table}.status = %s THEN %s ELSE {table}.status END,
+                resolved_at = CASE WHEN {table}.status = %s THEN NULL ELSE {table}.resolved_at END
+            WHERE {table}.merged_into_id IS NULL
+            RETURNING {columns}
+        """
+    return _GROUP_UPSERT_SQL
+
+
+def upsert_group(
+    project: Project,
+    fingerprint: str,
+    title: str,
+    level: str,
+    times: int = 1,
+    seen_at=None,
+    grouping_config: str = GROUPING_MESSAGE,
+) -> Group:
+    """Create the group for ``fingerprint`` or bump it by ``times`` events.
+    One INSERT ... ON CONFLICT DO UPDATE ... RETURNING round trip: resolved
+    groups reopen (regression) and ignored groups stay muted. An existing
+    group keeps the ``grouping_config`` it was created with. With
+    GROUP_COUNTER_BUFFER on, groups already seen by this worker skip the
+    statement and their counts are buffered (see ``counters.flush``). Inside
+    a transaction the buffer is only touched once it commits. A merged group
+    is returned unchanged.
+    """
+    now = seen_at or timezone.now()
+    if buffer_enabled():
+        group_id = cached_group_id(project.id, fingerprint)
+        if group_id is not None:
+            # Known group: buffer the count instead of locking its row
+            transaction.on_commit(lambda: record(group_id, times, now), robust=True)
+            group = Group(
+                id=group_id, project=project, fingerprint=fingerprint, title=title, level=level, last_seen=now,
+                grouping_config=grouping_config,
+            )
+            group._state.adding = False
+            return group
+    params = [
+        project.id, fingerprint, fingerprint_hash(fingerprint), title, level, times, now, now, Group.STATUS_UNRESOLVED,
+        grouping_config,
+        Group.STATUS_RESOLVED, Group.STATUS_UNRESOLVED,
+        Group.STATUS_RESOLVED,
+    ]
+    with connection.cursor() as cur:
+        cur.execute(_group_upsert_sql(), params)
+        row = cur.fetchone()
+    if row is None:
+        # Merged group: left untouched, its events count towards the target
+        return Group.objects.get(project=project, fingerprint_hash=fingerprint_hash(fingerprint))
+    group = Group.from_db(connection.alias, [f.attname for f in Group._meta.concrete_fields], row)
+    group.project = project
+    if buffer_enabled() and group.merged_into_id is None:
+        # A group created by a rolled back transaction must not be cached
+        transaction.on_commit(lambda: remember_group_id(project.id, fingerprint, group.id), robust=True)
+    return group
+
+
+def _redirect_merged(merged: Dict[str, int], times: Dict[str, int], group_specs: Dict[str, list]) -> Dict[str, Group]:
+    """Count events of merged groups towards the groups they were merged into,
+    for fingerprints this worker did not know were merged yet."""
+    for fp, target_id in sorted(merged.items(), key=lambda item: item[1]):
+        Group.objects.filter(id=target_id).update(
+            count=F("count") + times[fp], last_seen=Greatest(F("last_seen"), group_specs[fp][3])
+        )
+    targets = Group.objects.in_bulk(set(merged.values()))
+    return {fp: targets[target_id] for fp, target_id in merged.items() if target_id in targets}
+
+
+def _symbolicated_frames(release_id: int, frames, stack, memo: Dict[tuple, Any]) -> List[Dict[str, Any]] | None:
+    """Symbolicate once per distinct (release, frames, stack) in a batch;
+    storms repeat the same stack. None when symbolication failed."""
+    key = (release_id, orjson.dumps([frames, stack]))
+    if key not in memo:
+        try:
+            memo[key] = symbolicate_frames_for_release(Release(id=release_id), frames, stack)
+        except Exception as e:
+            print(f"Symbolication error: {e}")
+            memo[key] = None
+    return memo[key]
+
+
+def _grouping_frames(payload: dict, release_id: int | None, memo: Dict[tuple, Any]) -> List[Dict[str, Any]] | None:
+    frames, stack = payload.get("frames"), payload.get("stack")
+    if release_id and (frames or stack):
+        symbolicated = _symbolicated_frames(release_id, frames, stack, memo)
+        if symbolicated is not None:
+            return symbolicated
+    if isinstance(frames, list) and frames:
+        return frames
+    return parse_stacktrace(stack) if isinstance(stack, str) else None
+
+
+def _write_batch(
+    project: Project,
+    rows: List[tuple],
+    group_specs: Dict[str, list],
+    times: Dict[str, int],
+    store: List[bool],
+    symbolicated: List[Dict[str, Any]],
+) -> List[Event]:
+    # Group counts only move if the events are stored with them
+    with transaction.atomic():
+        # Sorted so concurrent batches lock group rows in the same order
+        groups = {
+            fp: upsert_group(project, fp, title, level, times=times[fp], seen_at=seen_at, grouping_config=config)
+            for fp, (title, level, _, seen_at, config) in sorted(group_specs.items())
+        }
+        merged = {fp: group.merged_into_id for fp, group in groups.items() if group.merged_into_id}
+        if merged:
+            groups.update(_redirect_merged(merged, times, group_specs))
+
+        events, stored = [], []
+        for i, (payload, message, level, env, release_id, fingerprint, received_at, sample_rate) in enumerate(rows):
+            if not store[i]:
+                # Counted in the group and published downstream, not stored
+                events.append(Event(
+                    project=project,
+                    group=groups[fingerprint],
+                    message=message,
+                    level=level,
+                    release_id=release_id,
+                    environment=env,
+                    received_at=received_at,
+                    sample_rate=sample_rate,
+                ))
+                continue
+            events.append(Event(
+                project=project,
+                group=groups[fingerprint],
+                message=message,
+                level=level,
+                payload=payload,
+                release_id=release_id,
+                environment=env,
+                stack=payload.get("stack"),
+                tags=payload.get("tags", []),
+                symbolicated=symbolicated[i],
+                received_at=received_at,
+                sample_rate=sample_rate,
+            ))
+            stored.append(events[-1])
+        Event.objects.bulk_create(stored)
+    return events
+
+
+def ingest_batch(
+    project: Project,
+    payloads: List[Dict[str, Any]],
+    received_ats: List[datetime] | None = None,
+    sample_rates: List[float] | None = None,
+) -> List[Event]:
+    """Group, persist and symbolicate a batch of event payloads for one project.
+    Each distinct group and release is touched once per batch and all events
+    are written with a single bulk insert; the group upserts and the insert
+    commit in one transaction. ``received_ats`` carries the accept
+    time of each payload when the batch was drained from the ingest queue;
+    ``sample_rates`` the spike-protection rate each payload was kept at (each
+    event counts 1 / rate towards its group). With GROUPING_CONFIG=stacktrace:1
+    events are symbolicated before grouping and grouped by their in-app frames;
+    the project's fingerprint rules override either.
+
+    Returns one Event per payload. Events throttled by the per-group storage
+    policy (see ``throttle.plan_storage``) are counted but not saved: their
+    ``id`` is None and they carry no payload, stack or symbolication.
+    """
+    now = timezone.now()
+    received_ats = received_ats or [now] * len(payloads)
+    sample_rates = sample_rates or [1.0] * len(payloads)
+    release_keys = {
+        (payload["release"], payload.get("environment", "production")) for payload in payloads if payload.get("release")
+    }
+    release_ids = {key: resolve_release_id(project.id, *key) for key in sorted(release_keys)}
+    stack_grouping = settings.GROUPING_CONFIG == GROUPING_STACKTRACE
+    rules = rules_for_project(project.id)
+    merges = merged_fingerprints(project.id)
+    symbolication_memo: Dict[tuple, Any] = {}
+    rows = []
+    group_specs: Dict[str, list] = {}
+    for payload, received_at, sample_rate in zip(payloads, received_ats, sample_rates):
+        message = payload.get("message", "")
+        level = normalize_level(payload)
+        env = payload.get("environment", "production")
+        release_id = release_ids.get((payload.get("release"), env)) if payload.get("release") else None
+        frames = _grouping_frames(payload, release_id, symbolication_memo) if stack_grouping else None
+        fingerprint, title, config = group_event(message, level, frames)
+        if rules is not None:
+            fingerprint, title, config = rules.apply(payload, message, level, env, fingerprint, title, config)
+        fingerprint = merges.get(fingerprint, fingerprint)
+        spec = group_specs.setdefault(fingerprint, [title, level, 0, received_at, config])
+        spec[2] += 1.0 / sample_rate
+        spec[3] = max(spec[3], received_at)
+        rows.append((payload, message, level, env, release_id, fingerprint, received_at, sample_rate))
+
+    times = {fp: weighted_count(weight) for fp, (_, _, weight, _, _) in group_specs.items()}
+    batch_sizes: Dict[str, int] = {}
+    for row in rows:
+        batch_sizes[row[5]] = batch_sizes.get(row[5], 0) + 1
+    # Redis counters and symbolication stay outside the transaction below
+    store_flags = {
+        fp: iter(flags)
+        for fp, flags in plan_storage(
+            project.id, {fp: (n, times[fp], group_specs[fp][3]) for fp, n in batch_sizes.items()}
+        ).items()
+    }
+    store = [next(store_flags[row[5]]) for row in rows]
+    symbolicated = [{} for _ in rows]
+    for i, (payload, _, _, _, release_id, _, _, _) in enumerate(rows):
+        if store[i] and release_id and (payload.get("frames") or payload.get("stack")):
+            frames = _symbolicated_frames(release_id, payload.get("frames"), payload.get("stack"), symbolication_memo)
+            if frames is not None:
+                symbolicated[i] = {"frames": frames}
+
+    try:
+        return _write_batch(project, rows, group_specs, times, store, symbolicated)
+    except IntegrityError:
+        # A group or release deleted by another worker may still be cached here:
+        # retry once through the real upsert and freshly resolved releases
+        for fp in group_specs:
+            forget_group_id(project.id, fp)
+        if release_keys:
+            forget_release_ids(project.id, release_keys)
+            release_ids = {key: resolve_release_id(project.id, *key) for key in sorted(release_keys)}
+            rows = [
+                row[:4] + (release_ids.get((row[0].get("release"), row[3])),) + row[5:] for row in rows
+            ]
+        return _write_batch(project, rows, group_specs, times, store, symbolicated)
+
+
+def _notify_batch(project: Project, events: List[Event], stored: List[Event]):
+    # Retries of these event ids now echo the stored ids
+    remember_event_ids(project.id, stored)
+    # Groups whose events were all throttled are evaluated on their latest stored event
+    throttled_groups = sorted({e.group_id for e in events} - {e.group_id for e in stored})
+    from .tasks import process_event_batch
+    try:
+        process_event_batch.delay([e.id for e in stored], throttled_groups)
+    except Exception:
+        # If Celery broker is not ready, evaluate alerts synchronously
+        try:
+            process_event_batch([e.id for e in stored], throttled_groups)
+        except Exception as e:
+            print(f"Alert evaluation error: {e}")
+
+    publish_events([
+        {
+            "id": e.id or 0,
+            "event_id": e.id or 0,
+            "project": project.slug,
+            "message": e.message,
+            "level": e.level,
+            "environment": e.environment,
+            "fingerprint": e.group.fingerprint if e.group else None,
+            "title": e.group.title if e.group else None,
+            "received_at": e.received_at.isoformat(),
+            "sample_rate": e.sample_rate,
+        }
+        for e in events
+    ])
+
+
+def _stream_events(project: Project, stored: List[Event]) -> List[Dict[str, Any]]:
+    timestamp = int(time.time() * 1000)
+    return [
+        {
+            "event_id": e.id,
+            "project": project.slug,
+            "message": e.message,
+            "level": e.level,
+            "environment": e.environment,
+            "release": (e.payload or {}).get("release"),
+            "fingerprint": e.group.fingerprint if e.group else None,
+            "timestamp": timestamp,
+        }
+        for e in stored
+    ]
+
+
+def dispatch_batch(project: Project, events: List[Event]):
+    """Hand an ingested batch to alerting, Kafka and the live stream in one go each.
+    Throttled (unsaved) events still reach Kafka so ClickHouse sees every event.
+    """
+    if not events:
+        return
+    stored = [e for e in events if e.id is not None]
+    _notify_batch(project, events, stored)
+    try:
+        publish_stream(project.slug, _stream_events(project, stored))
+    except Exception as e:
+        print(f"❌ [WebSocket] Publish error: {e}")
+
+
+async def adispatch_batch(project: Project, events: List[Event]):
+    """``dispatch_batch`` for async views: the live stream publish stays on the
+    loop; Celery, Kafka and Redis bookkeeping run in a worker thread."""
+    if not events:
+        return
+    stored = [e for e in events if e.id is not None]
+    await sync_to_async(_notify_batch, thread_sensitive=False)(project, events, stored)
+    try:
+        await apublish_stream(project.slug, _stream_events(project, stored))
+    except Exception as e:
+        print(f"❌ [WebSocket] Publish error: {e}")
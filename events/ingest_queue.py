@@ -0,0 +1,130 @@
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+from .ratelimit import get_async_redis, get_redis
+
+
+STREAM_KEY = "ingest:events"
+DEAD_LETTER_KEY = "ingest:dead"
+CONSUMER_GROUP = "ingest-workers"
+
+
+def queue_enabled() -> bool:
+    return settings.INGEST_MODE == "queue"
+
+
+def _entry(project_id: int, payloads: List[Dict[str, Any]], sample_rate: float) -> Dict[str, Any]:
+    fields = {
+        "project": project_id,
+        "ts": f"{time.time():.6f}",
+        "payloads": json.dumps(payloads),
+    }
+    if sample_rate < 1.0:
+        fields["rate"] = f"{sample_rate:.6f}"
+    return fields
+
+
+def enqueue_events(project_id: int, payloads: List[Dict[str, Any]], sample_rate: float = 1.0) -> str:
+    """Append raw payloads for a project to the durable ingest stream.
+    The stream is trimmed approximately to ``INGEST_QUEUE_MAXLEN`` entries.
+    """
+    return get_redis().xadd(
+        STREAM_KEY,
+        _entry(project_id, payloads, sample_rate),
+        maxlen=settings.INGEST_QUEUE_MAXLEN,
+        approximate=True,
+    )
+
+
+async def aenqueue_events(project_id: int, payloads: List[Dict[str, Any]], sample_rate: float = 1.0) -> str:
+    """``enqueue_events`` for async views, on the asyncio Redis client."""
+    return await get_async_redis().xadd(
+        STREAM_KEY,
+        _entry(project_id, payloads, sample_rate),
+        maxlen=settings.INGEST_QUEUE_MAXLEN,
+        approximate=True,
+    )
+
+
+def ensure_consumer_group():
+    r = get_redis()
+    try:
+        r.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id="0", mkstream=True)
+    except Exception as e:
+        # BUSYGROUP: the group already exists
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def read_batch(consumer: str, count: int, block_ms: int, min_idle_ms: int):
+    """Return up to ``count`` stream entries for this consumer.
+    Entries left pending by a crashed worker for longer than ``min_idle_ms``
+    are reclaimed first, so nothing accepted with a 202 is lost. Reclaimed
+    entries already delivered ``INGEST_QUEUE_MAX_DELIVERIES`` times are moved
+    to the dead-letter stream instead of being retried again.
+    """
+    r = get_redis()
+    _, claimed, *_ = r.xautoclaim(STREAM_KEY, CONSUMER_GROUP, consumer, min_idle_ms, start_id="0-0", count=count)
+    entries = [e for e in claimed if e[1]]
+    if entries:
+        deliveries = {
+            p["message_id"]: p["times_delivered"]
+            for p in r.xpending_range(
+                STREAM_KEY, CONSUMER_GROUP, entries[0][0], entries[-1][0], len(claimed), consumername=consumer
+            )
+        }
+        dead = [e for e in entries if deliveries.get(e[0], 0) > settings.INGEST_QUEUE_MAX_DELIVERIES]
+        if dead:
+            dead_letter(dead, deliveries)
+            dead_ids = {e[0] for e in dead}
+            entries = [e for e in entries if e[0] not in dead_ids]
+    if len(entries) < count:
+        resp = r.xreadgroup(CONSUMER_GROUP, consumer, {STREAM_KEY: ">"}, count=count - len(entries), block=block_ms)
+        for _stream, items in resp or []:
+            entries.extend(items)
+    return entries
+
+
+def decode_entries(entries):
+    """Fold stream entries into ``{project_id: [(entry_id, payload, received_at, sample_rate), ...]}``.
+    Also returns the ids of malformed entries so they can be acked and dropped.
+    """
+    by_project: Dict[int, list] = {}
+    malformed = []
+    for entry_id, fields in entries:
+        try:
+            project_id = int(fields[b"project"])
+            received_at = datetime.fromtimestamp(float(fields[b"ts"]), tz=dt_timezone.utc)
+            payloads = json.loads(fields[b"payloads"])
+            sample_rate = float(fields.get(b"rate", 1.0))
+        except Exception as e:
+            print(f"Dropping malformed ingest entry {entry_id!r}: {e}")
+            malformed.append(entry_id)
+            continue
+        by_project.setdefault(project_id, []).extend((entry_id, p, received_at, sample_rate) for p in payloads)
+    return by_project, malformed
+
+
+def dead_letter(entries, deliveries: Dict[bytes, int]):
+    """Copy entries that keep failing to ``ingest:dead`` (with their original
+    id and delivery count) and ack them on the ingest stream."""
+    pipe = get_redis().pipeline()
+    for entry_id, fields in entries:
+        print(f"Dead-lettering ingest entry {entry_id!r} after {deliveries.get(entry_id)} deliveries")
+        pipe.xadd(
+            DEAD_LETTER_KEY,
+            {**fields, b"source_id": entry_id, b"deliveries": deliveries.get(entry_id, 0)},
+            maxlen=settings.INGEST_QUEUE_MAXLEN,
+            approximate=True,
+        )
+    pipe.xack(STREAM_KEY, CONSUMER_GROUP, *[entry_id for entry_id, _ in entries])
+    pipe.execute()
+
+
+def ack(entry_ids):
+    if entry_ids:
+        get_redis().xack(STREAM_KEY, CONSUMER_GROUP, *entry_ids)
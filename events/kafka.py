@@ -1,33 +1,213 @@
+import atexit
 import json
 import os
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, Dict, List
 
+import msgpack
 from kafka import KafkaProducer
 
+from . import spool
+
 _producer = None
+_lock = threading.Lock()
+# Producer construction waits for the bootstrap servers; while the broker is
+# down a failure is remembered for KAFKA_PRODUCER_RETRY_SECONDS so requests go
+# straight to the spool instead of each waiting on a new producer.
+_producer_lock = threading.Lock()
+_producer_retry_at = 0.0
+
+
+class ProducerUnavailable(RuntimeError):
+    """The producer failed to start recently or is being started by another thread."""
+
+# Delivery accounting, updated from the producer's I/O thread
+_stats = {"sent": 0, "delivered": 0, "failed": 0, "dropped": 0}
+_in_flight = 0
+
+
+def _bump(name: str, in_flight_delta: int = 0):
+    global _in_flight
+    with _lock:
+        _stats[name] += 1
+        _in_flight += in_flight_delta
+
+
+def _on_delivered(_metadata):
+    _bump("delivered", -1)
+
+
+def _on_failed(topic: str, data: Dict[str, Any], exc):
+    _bump("failed", -1)
+    print(f"Kafka delivery failed: {exc}; spooling record")
+    spool.append([(topic, data)])
+
+
+# KAFKA_ENCODING=msgpack frames each value as a zero magic byte (JSON values
+# always start with "{"), a schema version byte and a msgpack body, so consumers
+# can tell both formats apart and JSON producers keep working.
+MAGIC = b"\x00"
+SCHEMA_VERSION = 1
+
+
+def encode_value(data: Dict[str, Any]) -> bytes:
+    if os.environ.get("KAFKA_ENCODING", "json") == "msgpack":
+        return MAGIC + bytes([SCHEMA_VERSION]) + msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data).encode("utf-8")
+
+
+def partition_key(data: Dict[str, Any]) -> bytes | None:
+    """Key records by project (KAFKA_PARTITION_KEY=project, the default) or by
+    project and fingerprint (project_fingerprint) so a project's records keep
+    their order within one partition; "none" leaves partitioning to the client.
+    """
+    mode = os.environ.get("KAFKA_PARTITION_KEY", "project")
+    project = data.get("project")
+    if mode == "none" or not project:
+        return None
+    if mode == "project_fingerprint" and data.get("fingerprint"):
+        return f"{project}:{data['fingerprint']}".encode("utf-8")
+    return str(project).encode("utf-8")
 
 
 def get_producer() -> KafkaProducer:
+    global _producer, _producer_retry_at
+    if _producer is not None:
+        return _producer
+    if time.monotonic() < _producer_retry_at:
+        raise ProducerUnavailable("Kafka producer failed to start; retrying later")
+    if not _producer_lock.acquire(blocking=False):
+        raise ProducerUnavailable("Kafka producer is starting")
+    try:
+        if _producer is None:
+            servers = os.environ.get("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
+            compression = os.environ.get("KAFKA_COMPRESSION", "lz4") or None
+            try:
+                _producer = KafkaProducer(
+                    bootstrap_servers=servers.split(","),
+                    value_serializer=encode_value,
+                    linger_ms=int(os.environ.get("KAFKA_LINGER_MS", "50")),
+                    batch_size=int(os.environ.get("KAFKA_BATCH_SIZE", "65536")),
+                    compression_type=None if compression == "none" else compression,
+                    # send() must never stall a request for long when buffers are full
+                    max_block_ms=int(os.environ.get("KAFKA_MAX_BLOCK_MS", "100")),
+                )
+            except Exception:
+                _producer_retry_at = time.monotonic() + float(os.environ.get("KAFKA_PRODUCER_RETRY_SECONDS", "5"))
+                raise
+            atexit.register(close_producer)
+        return _producer
+    finally:
+        _producer_lock.release()
+
+
+def close_producer(timeout: float = 5.0):
+    """Flush whatever is still buffered and close the producer (worker shutdown)."""
     global _producer
-    if _producer is None:
-        servers = os.environ.get("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
-        _producer = KafkaProducer(
-            bootstrap_servers=servers.split(","),
-            value_serializer=lambda v: json.dumps(v).encode("utf-8"),
-            linger_ms=50,
-        )
-    return _producer
+    producer, _producer = _producer, None
+    if producer is None:
+        return
+    try:
+        producer.flush(timeout)
+        producer.close(timeout)
+    except Exception as e:
+        print(f"Kafka close error: {e}")
+
+
+def producer_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats, in_flight=_in_flight)
+
+
+def _has_room() -> bool:
+    """Apply the overflow policy when KAFKA_MAX_BACKLOG records are in flight.
+    "drop" turns the new record away; "block" waits up to KAFKA_MAX_BLOCK_MS
+    for the backlog to drain first. Turned away records go to the spool when
+    it is enabled and are dropped otherwise.
+    """
+    max_backlog = int(os.environ.get("KAFKA_MAX_BACKLOG", "100000"))
+    if _in_flight < max_backlog:
+        return True
+    if os.environ.get("KAFKA_OVERFLOW_POLICY", "drop") == "block":
+        try:
+            get_producer().flush(int(os.environ.get("KAFKA_MAX_BLOCK_MS", "100")) / 1000.0)
+        except Exception:
+            pass
+        if _in_flight < max_backlog:
+            return True
+    return False
+
+
+def _send(producer: KafkaProducer, topic: str, data: Dict[str, Any]):
+    if not _has_room():
+        if spool.enabled():
+            spool.append([(topic, data)])
+        else:
+            _bump("dropped")
+        return
+    _produce(producer, topic, data)
+
+
+def _produce(producer: KafkaProducer, topic: str, data: Dict[str, Any]):
+    future = producer.send(topic, value=data, key=partition_key(data))
+    _bump("sent", 1)
+    future.add_callback(_on_delivered)
+    future.add_errback(_on_failed, topic, data)
+
+
+def _broker_connected() -> bool:
+    try:
+        return get_producer().bootstrap_connected()
+    except Exception:
+        return False
+
+
+def _start_spool_replayer():
+    # Replay skips the overflow policy: it flushes after every batch of
+    # KAFKA_MAX_BACKLOG records instead, so nothing it sends is turned away
+    spool.start_replayer(
+        send=lambda topic, data: _produce(get_producer(), topic, data),
+        flush=lambda: get_producer().flush(10),
+        connected=_broker_connected,
+        batch_size=max(1, int(os.environ.get("KAFKA_MAX_BACKLOG", "100000"))),
+    )
 
 
 def publish_event(data: Dict[str, Any], topic: str | None = None):
+    """Queue a record for asynchronous delivery; never waits on the broker.
+    Records the producer cannot take are spooled to disk and replayed later.
+    """
     topic = topic or os.environ.get("KAFKA_TOPIC", "events")
+    _start_spool_replayer()
+    try:
+        _send(get_producer(), topic, data)
+    except Exception as e:
+        # Producer unavailable or buffer full past max_block_ms
+        print(f"Kafka publish error: {e}; spooling record")
+        spool.append([(topic, data)])
+
+
+def publish_events(records: List[Dict[str, Any]], topic: str | None = None):
+    """Queue many records; the producer batches them by linger_ms/batch_size."""
+    if not records:
+        return
+    topic = topic or os.environ.get("KAFKA_TOPIC", "events")
+    _start_spool_replayer()
     try:
         producer = get_producer()
-        producer.send(topic, value=data)
-        producer.flush(1)
-    except Exception:
-        # Best-effort; ignore failures for now
-        pass
+    except Exception as e:
+        print(f"Kafka publish error: {e}; spooling {len(records)} records")
+        spool.append([(topic, data) for data in records])
+        return
+    failed = []
+    for data in records:
+        try:
+            _send(producer, topic, data)
+        except Exception as e:
+            print(f"Kafka publish error: {e}; spooling record")
+            failed.append((topic, data))
+    spool.append(failed)
 
 
 def publish_session(data: Dict[str, Any]):
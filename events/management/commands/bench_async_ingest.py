@@ -0,0 +1,81 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from events.management.commands.bench_json_ingest import sample_payload
+from events.models import Project
+from events.views import AsyncTokenIngestView, TokenIngestView
+
+
+OK_STATUSES = (200, 201, 202)
+
+
+class Command(BaseCommand):
+    help = "Load-test single-event token ingest: sync view on a thread pool vs the native async view on one event loop"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per path")
+        parser.add_argument("--concurrency", type=int, default=32, help="In-flight requests")
+        parser.add_argument("--mode", choices=["sync", "queue"], default="sync", help="INGEST_MODE to benchmark")
+
+    def _report(self, label: str, elapsed: float, latencies: list):
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{label:>24}: {len(latencies) / elapsed:8.0f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:7.2f} ms, p99 {p99 * 1000:7.2f} ms"
+        )
+
+    def _run_sync(self, token: str, bodies: list, concurrency: int):
+        factory = RequestFactory()
+        view = TokenIngestView.as_view()
+
+        def call(body):
+            start = time.perf_counter()
+            try:
+                response = view(factory.post("/", body, content_type="application/json"), token=token)
+            finally:
+                connection.close()
+            if response.status_code not in OK_STATUSES:
+                raise CommandError(f"sync ingest failed: {response.status_code} {response.content!r}")
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(call, bodies))
+        return time.perf_counter() - start, latencies
+
+    async def _run_async(self, token: str, bodies: list, concurrency: int):
+        factory = AsyncRequestFactory()
+        view = AsyncTokenIngestView.as_view()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def call(body):
+            async with gate:
+                start = time.perf_counter()
+                response = await view(factory.post("/", body, content_type="application/json"), token=token)
+                if response.status_code not in OK_STATUSES:
+                    raise CommandError(f"async ingest failed: {response.status_code} {response.content!r}")
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(call(body) for body in bodies))
+        return time.perf_counter() - start, list(latencies)
+
+    def handle(self, *args, **options):
+        n, concurrency = options["requests"], options["concurrency"]
+        bodies = [json.dumps(sample_payload(i)).encode() for i in range(n)]
+        project = Project.objects.create(name=f"bench-async-{time.time_ns()}", slug=f"bench-async-{time.time_ns()}")
+        try:
+            self.stdout.write(f"{n} single-event requests per path, concurrency {concurrency}, INGEST_MODE={options['mode']}")
+            with override_settings(RATE_LIMIT_EVENTS_PER_MINUTE=10**9, INGEST_MODE=options["mode"], EVENT_DEDUP_TTL=0):
+                self._report("sync view, thread pool", *self._run_sync(project.ingest_token, bodies, concurrency))
+                self._report("async view, event loop", *asyncio.run(self._run_async(project.ingest_token, bodies, concurrency)))
+        finally:
+            project.delete()
@@ -0,0 +1,89 @@
+import random
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from events import similarity
+
+
+TEMPLATES = [
+    "FileNotFoundError: could not open /home/{user}/projects/{word}/config/settings.yaml for reading",
+    "KeyError: '{word}' while rendering template accounts/{word}/profile.html for user {user}",
+    "ValidationError: field '{word}' of order form rejected value \"{word}-{word}\"",
+    "PermissionError: user {user} may not write to /srv/{word}/uploads/{word}",
+    "TypeError: Cannot read properties of undefined (reading '{word}') in {word}Controller",
+    "ConnectionError: upstream {word}-api refused connection from worker {user}",
+]
+
+
+def synthetic_titles(size: int, seed: int = 7):
+    """Titles from many message shapes (TEMPLATES plus random ones, about 50
+    groups each) whose paths, quoted values and user names vary."""
+    rng = random.Random(seed)
+
+    def word() -> str:
+        return "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 9)))
+
+    users = [f"user{rng.randint(0, 10**6)}" for _ in range(max(1, size // 20))]
+    words = [word() for _ in range(max(1, size // 10))]
+    templates = list(TEMPLATES)
+    while len(templates) < max(1, size // 50):
+        parts = [word() for _ in range(rng.randint(6, 12))] + ["'{word}'", "/var/{word}/{user}"]
+        rng.shuffle(parts)
+        templates.append(f"{word().capitalize()}Error: " + " ".join(parts))
+    titles = []
+    for _ in range(size):
+        title = rng.choice(templates)
+        while "{" in title:
+            title = title.replace("{user}", rng.choice(users), 1).replace("{word}", rng.choice(words), 1)
+        titles.append(title)
+    return titles
+
+
+class Command(BaseCommand):
+    help = "Compare MinHash/LSH near-duplicate lookup with pairwise comparison over synthetic group titles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=20000, help="Synthetic groups to index")
+        parser.add_argument("--lookups", type=int, default=200, help="Groups to look up")
+        parser.add_argument("--threshold", type=float, default=0.8)
+
+    def handle(self, *args, **options):
+        titles = synthetic_titles(options["groups"])
+        start = time.perf_counter()
+        signatures = [similarity.minhash(similarity.group_tokens(t)) for t in titles]
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"signed {len(titles)} groups in {elapsed:.2f}s ({elapsed * 1e6 / len(titles):.0f} us/group)")
+
+        # In-memory stand-in for the GIN index on GroupSignature.band_keys
+        buckets = defaultdict(list)
+        for gid, sig in enumerate(signatures):
+            for key in similarity.band_keys(1, sig):
+                buckets[key].append(gid)
+
+        rng = random.Random(11)
+        probes = rng.sample(range(len(titles)), min(options["lookups"], len(titles)))
+        threshold = options["threshold"]
+        lsh_time = brute_time = 0.0
+        candidates = found = expected = 0
+        for gid in probes:
+            start = time.perf_counter()
+            cands = {c for key in similarity.band_keys(1, signatures[gid]) for c in buckets[key]} - {gid}
+            hits = {c for c in cands if similarity.estimate_similarity(signatures[gid], signatures[c]) >= threshold}
+            lsh_time += time.perf_counter() - start
+            start = time.perf_counter()
+            exact = {
+                c for c, sig in enumerate(signatures)
+                if c != gid and similarity.estimate_similarity(signatures[gid], sig) >= threshold
+            }
+            brute_time += time.perf_counter() - start
+            candidates += len(cands)
+            found += len(hits & exact)
+            expected += len(exact)
+
+        n = len(probes)
+        self.stdout.write(f"{'pairwise':>10}: {brute_time * 1e3 / n:8.2f} ms/lookup, {len(titles) - 1} comparisons")
+        self.stdout.write(f"{'lsh':>10}: {lsh_time * 1e3 / n:8.2f} ms/lookup, {candidates / n:.0f} candidates")
+        self.stdout.write(f"{'recall':>10}: {found / expected if expected else 1.0:8.3f} at similarity >= {threshold}")
+        self.stdout.write(f"{'speedup':>10}: {brute_time / lsh_time if lsh_time else 0:8.1f}x")
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from events.grouping import compute_fingerprint, fingerprint_hash
+from events.ingest import upsert_group
+from events.models import Group, Project
+
+
+def legacy_get_or_create_group(project: Project, message: str, level: str) -> Group:
+    """The pre-upsert implementation, kept here as the benchmark baseline."""
+    fingerprint, title = compute_fingerprint(message, level)
+    now = timezone.now()
+    group, created = Group.objects.get_or_create(
+        project=project, fingerprint_hash=fingerprint_hash(fingerprint),
+        defaults={"fingerprint": fingerprint, "title": title, "level": level, "first_seen": now, "last_seen": now, "count": 1},
+    )
+    if not created:
+        updates = {"last_seen": now, "level": level, "count": F("count") + 1}
+        if group.status == Group.STATUS_RESOLVED:
+            updates["status"] = Group.STATUS_UNRESOLVED
+            updates["resolved_at"] = None
+        Group.objects.filter(id=group.id).update(**updates)
+        group.refresh_from_db(fields=["count", "last_seen", "level", "status", "resolved_at"])
+    return group
+
+
+def upsert_get_or_create_group(project: Project, message: str, level: str) -> Group:
+    fingerprint, title = compute_fingerprint(message, level)
+    return upsert_group(project, fingerprint, title, level)
+
+
+class Command(BaseCommand):
+    help = "Compare DB round trips and latency of the legacy group get_or_create path with the single-statement upsert"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=2000, help="Events per run")
+        parser.add_argument("--groups", type=int, default=20, help="Distinct fingerprints per run")
+
+    def handle(self, *args, **options):
+        n, k = options["events"], options["groups"]
+        messages = [f"Benchmark failure kind {chr(65 + i % 26)}{'x' * (i // 26)}" for i in range(k)]
+        for label, fn in (("legacy get_or_create", legacy_get_or_create_group), ("upsert", upsert_get_or_create_group)):
+            project = Project.objects.create(name=f"bench-upsert-{time.time_ns()}", slug=f"bench-upsert-{time.time_ns()}")
+            try:
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    for i in range(n):
+                        fn(project, messages[i % k], "error")
+                    elapsed = time.perf_counter() - start
+                counts = sum(Group.objects.filter(project=project).values_list("count", flat=True))
+                self.stdout.write(
+                    f"{label:>22}: {len(ctx.captured_queries) / n:.2f} queries/event, "
+                    f"{elapsed * 1e6 / n:.0f} us/event, {n / elapsed:.0f} events/s (total count {counts})"
+                )
+            finally:
+                project.delete()
@@ -0,0 +1,113 @@
+import io
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from events.ingest import dispatch_batch, ingest_batch
+from events.models import Project
+from events.parsers import ORJSONParser
+from events.projects import project_by_token_or_404
+from events.ratelimit import rate_limit
+from events.renderers import ORJSONRenderer
+from events.serializers import EventSerializer
+from events.views import TokenIngestView
+
+
+class StockDRFIngestView(APIView):
+    """Baseline: the same ingest pipeline behind stock DRF parsing/rendering."""
+    parser_classes = [JSONParser]
+    renderer_classes = [JSONRenderer]
+
+    def post(self, request, token=None):
+        project = project_by_token_or_404(token)
+        result = rate_limit(f"token:{project.ingest_token}", settings.RATE_LIMIT_EVENTS_PER_MINUTE)
+        if not result.allowed:
+            return Response({"detail": "Rate limit exceeded"}, status=429)
+        events = ingest_batch(project, [request.data or {}])
+        dispatch_batch(project, events)
+        return Response(EventSerializer(events[0]).data, status=201)
+
+
+def sample_payload(i: int) -> dict:
+    frames = [
+        {"file": f"src/module_{j}.js", "line": 100 + j, "column": 7 * j, "function": f"handler{j}", "in_app": j % 2 == 0}
+        for j in range(40)
+    ]
+    return {
+        "message": f"TypeError: cannot read properties of undefined (reading 'id') #{i % 10}",
+        "level": "error",
+        "environment": "production",
+        "frames": frames,
+        "stack": "\n".join(f"    at {f['function']} ({f['file']}:{f['line']}:{f['column']})" for f in frames),
+        "tags": [{"key": "browser", "value": "Chrome 126"}, {"key": "os", "value": "macOS"}],
+        "extra": {"user": {"id": i, "email": f"user{i}@example.com"}, "breadcrumbs": ["click"] * 30},
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare stock DRF JSON parse/render and the orjson classes, and the DRF ingest path with the lean token ingest view"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=2000, help="Parse/render iterations")
+        parser.add_argument("--page", type=int, default=50, help="Events per rendered list page")
+        parser.add_argument("--requests", type=int, default=300, help="Ingest requests per path")
+
+    def _rate(self, label: str, n: int, fn):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:>28}: {elapsed * 1e6 / n:8.0f} us/op, {n / elapsed:8.0f} ops/s")
+
+    def handle(self, *args, **options):
+        n = options["iterations"]
+        body = json.dumps(sample_payload(0)).encode()
+        payloads = [sample_payload(i) for i in range(options["page"])]
+        page = {
+            "count": len(payloads),
+            "next": None,
+            "previous": None,
+            "results": [
+                {"id": i, "message": p["message"], "payload": p, "symbolicated": {"frames": p["frames"]}}
+                for i, p in enumerate(payloads)
+            ],
+        }
+        self.stdout.write(f"Parse one {len(body)} byte event / render a {options['page']} event list page")
+        self._rate("parse: DRF JSONParser", n, lambda: JSONParser().parse(io.BytesIO(body)))
+        self._rate("parse: ORJSONParser", n, lambda: ORJSONParser().parse(io.BytesIO(body)))
+        self._rate("render: DRF JSONRenderer", max(1, n // 10), lambda: JSONRenderer().render(page))
+        self._rate("render: ORJSONRenderer", max(1, n // 10), lambda: ORJSONRenderer().render(page))
+
+        factory = RequestFactory()
+        project = Project.objects.create(name=f"bench-json-{time.time_ns()}", slug=f"bench-json-{time.time_ns()}")
+        try:
+            token = project.ingest_token
+            drf_view = StockDRFIngestView.as_view()
+            lean_view = TokenIngestView.as_view()
+
+            def drf_call():
+                request = factory.post("/", body, content_type="application/json")
+                response = drf_view(request, token=token)
+                response.render()
+                if response.status_code != 201:
+                    raise CommandError(f"ingest failed: {response.status_code} {response.content!r}")
+
+            def lean_call():
+                request = factory.post("/", body, content_type="application/json")
+                response = lean_view(request, token=token)
+                if response.status_code != 201:
+                    raise CommandError(f"ingest failed: {response.status_code} {response.content!r}")
+
+            self.stdout.write(f"End-to-end single-event ingest ({options['requests']} requests each)")
+            with override_settings(RATE_LIMIT_EVENTS_PER_MINUTE=10**9, INGEST_MODE="sync"):
+                self._rate("ingest: DRF APIView", options["requests"], drf_call)
+                self._rate("ingest: lean TokenIngestView", options["requests"], lean_call)
+        finally:
+            project.delete()
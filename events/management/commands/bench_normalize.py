@@ -0,0 +1,92 @@
+import random
+import re
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events import grouping
+
+
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_HEX_RE = re.compile(r"\b0x[0-9a-fA-F]+\b")
+_UUID_RE = re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}-[0-9a-fA-F]{12}\b")
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+
+def legacy_normalize_message(message: str) -> str:
+    """The four-pass implementation, kept here as the benchmark baseline."""
+    if not message:
+        return ""
+    m = message.strip()
+    m = _EMAIL_RE.sub("<email>", m)
+    m = _UUID_RE.sub("<uuid>", m)
+    m = _HEX_RE.sub("<hex>", m)
+    m = _NUMBER_RE.sub("<n>", m)
+    return m[:500]
+
+
+TEMPLATES = [
+    "TypeError: Cannot read properties of undefined (reading 'id') at checkout.js:{n}:{n}",
+    "User {email} failed login attempt {n} from 10.0.{n}.{n}",
+    "Order {uuid} could not be charged: card_declined (attempt {n})",
+    "Segmentation fault at address {hex} in worker {n}",
+    "Timeout after {n}ms waiting for upstream payments-api (request {uuid})",
+    "KeyError: 'user_{n}' while rendering /accounts/{n}/settings",
+    "django.db.utils.OperationalError: could not connect to server: Connection refused (port {n})",
+    "Failed to fetch https://cdn.example.com/assets/app.{hex}.js: 503",
+]
+
+
+def render(template: str, rng: random.Random) -> str:
+    out = template
+    while "{" in out:
+        out = (
+            out.replace("{n}", str(rng.randint(0, 99999)), 1)
+            .replace("{email}", f"user{rng.randint(0, 10**6)}@example.com", 1)
+            .replace("{uuid}", str(uuid.UUID(int=rng.getrandbits(128), version=4)), 1)
+            .replace("{hex}", hex(rng.getrandbits(48)), 1)
+        )
+    return out
+
+
+def corpora(size: int, seed: int = 42):
+    rng = random.Random(seed)
+    # Storm: a few hundred distinct messages repeated (retries, loops, fan-out)
+    distinct = [render(rng.choice(TEMPLATES), rng) for _ in range(200)]
+    storm = [rng.choice(distinct) for _ in range(size)]
+    # Unique: every message carries fresh ids, so the cache never hits
+    unique = [render(rng.choice(TEMPLATES), rng) for _ in range(size)]
+    # Long: multi-line messages with embedded stack traces
+    long = [
+        "\n".join(render(rng.choice(TEMPLATES), rng) for _ in range(rng.randint(5, 25)))
+        for _ in range(max(1, size // 10))
+    ]
+    return {"storm": storm, "unique": unique, "long": long}
+
+
+class Command(BaseCommand):
+    help = "Compare the four-pass message normalizer with the single-pass regex, uncached and behind the LRU"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=50000, help="Messages per corpus")
+
+    def _rate(self, label: str, messages, fn) -> float:
+        start = time.perf_counter()
+        for m in messages:
+            fn(m)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:>28}: {elapsed * 1e6 / len(messages):7.2f} us/msg, {len(messages) / elapsed:9.0f} msg/s")
+        return elapsed
+
+    def handle(self, *args, **options):
+        for name, messages in corpora(options["messages"]).items():
+            mismatched = [m for m in messages if grouping.normalize_message(m) != legacy_normalize_message(m)]
+            if mismatched:
+                raise CommandError(f"{name}: {len(mismatched)} messages normalize differently, e.g. {mismatched[0]!r}")
+            self.stdout.write(f"{name} corpus: {len(messages)} messages, {len(set(messages))} distinct")
+            base = self._rate("four passes", messages, legacy_normalize_message)
+            self._rate("single pass", messages, grouping._normalize)
+            grouping._normalize_cached.cache_clear()
+            cached = self._rate("single pass + LRU", messages, grouping.normalize_message)
+            self.stdout.write(f"{'speedup':>28}: {base / cached:7.2f}x")
@@ -0,0 +1,86 @@
+import os
+import signal
+import socket
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from events.ingest import dispatch_batch, ingest_batch
+from events.ingest_queue import ack, decode_entries, ensure_consumer_group, read_batch
+from events.models import Project
+
+
+class Command(BaseCommand):
+    help = "Drain the ingest queue (INGEST_MODE=queue): group, persist and fan out events in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Max stream entries per batch")
+        parser.add_argument("--block-ms", type=int, default=1000, help="How long to wait for new entries")
+        parser.add_argument("--claim-idle-ms", type=int, default=60000, help="Reclaim entries pending longer than this")
+        parser.add_argument("--consumer", type=str, default=None, help="Consumer name (defaults to host:pid)")
+
+    def handle(self, *args, **options):
+        consumer = options["consumer"] or f"{socket.gethostname()}:{os.getpid()}"
+        # Exit through SystemExit so atexit hooks (Kafka producer flush) run
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        ensure_consumer_group()
+        self.stdout.write(self.style.SUCCESS(f"Ingest worker {consumer} started"))
+        while True:
+            try:
+                entries = read_batch(consumer, options["batch_size"], options["block_ms"], options["claim_idle_ms"])
+            except Exception as e:
+                self.stderr.write(f"Ingest queue read error: {e}")
+                time.sleep(1)
+                continue
+            if not entries:
+                continue
+            close_old_connections()
+            by_project, malformed = decode_entries(entries)
+            ack(malformed)
+            projects = Project.objects.in_bulk(list(by_project))
+            for project_id, items in by_project.items():
+                entry_ids = sorted({item[0] for item in items})
+                project = projects.get(project_id)
+                if project is None:
+                    # Project deleted after the events were accepted
+                    ack(entry_ids)
+                    continue
+                try:
+                    events = _ingest_items(project, items)
+                except Exception as e:
+                    # The batch rolled back as a whole; retry entry by entry so one bad
+                    # entry stays pending alone (reclaimed after --claim-idle-ms, then
+                    # dead-lettered after INGEST_QUEUE_MAX_DELIVERIES)
+                    self.stderr.write(f"Ingest batch for project {project_id} failed: {e}")
+                    if len(entry_ids) > 1:
+                        self._ingest_each(project, items)
+                    continue
+                ack(entry_ids)
+                self._dispatch(project, events)
+
+    def _ingest_each(self, project, items):
+        by_entry = {}
+        for item in items:
+            by_entry.setdefault(item[0], []).append(item)
+        for entry_id, entry_items in by_entry.items():
+            try:
+                events = _ingest_items(project, entry_items)
+            except Exception as e:
+                self.stderr.write(f"Ingest entry {entry_id!r} for project {project.id} failed: {e}")
+                continue
+            ack([entry_id])
+            self._dispatch(project, events)
+
+    def _dispatch(self, project, events):
+        # The events are stored and acked; a fanout failure must not stop the worker
+        try:
+            dispatch_batch(project, events)
+        except Exception as e:
+            self.stderr.write(f"Dispatch for project {project.id} failed: {e}")
+
+
+def _ingest_items(project, items):
+    _, payloads, received_ats, sample_rates = zip(*items)
+    return ingest_batch(project, list(payloads), list(received_ats), list(sample_rates))
@@ -0,0 +1,165 @@
+import io
+import zlib
+
+import zstandard
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+
+INGEST_PATH_PREFIXES = (
+    "/api/events/ingest/",
+    "/api/events/envelope/",
+    "/api/sessions/ingest/",
+)
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def _zlib_chunks(stream, wbits: int, limit: int, multi_member: bool = False):
+    d = zlib.decompressobj(wbits)
+    total = 0
+    pending = b""  # input read past the end of the previous gzip member
+    while True:
+        chunk = pending or stream.read(_CHUNK_SIZE)
+        pending = b""
+        data = d.decompress(chunk, limit + 1 - total) if chunk else d.flush()
+        # Input that did not fit under max_length stays in unconsumed_tail
+        while True:
+            total += len(data)
+            if total > limit:
+                raise BodyTooLarge()
+            yield data
+            if not d.unconsumed_tail:
+                break
+            data = d.decompress(d.unconsumed_tail, limit + 1 - total)
+        if d.eof:
+            if not multi_member:
+                return
+            # Concatenated gzip members decode as one body (RFC 1952 2.2)
+            pending = d.unused_data or stream.read(_CHUNK_SIZE)
+            if not pending:
+                return
+            d = zlib.decompressobj(wbits)
+            continue
+        if not chunk:
+            raise zlib.error("truncated stream")
+
+
+def _zstd_chunks(stream, limit: int):
+    total = 0
+    with zstandard.ZstdDecompressor().stream_reader(stream, read_size=_CHUNK_SIZE) as reader:
+        while True:
+            data = reader.read(_CHUNK_SIZE)
+            if not data:
+                return
+            total += len(data)
+            if total > limit:
+                raise BodyTooLarge()
+            yield data
+
+
+def decompress_stream(stream, encoding: str, limit: int) -> bytes:
+    """Decompress ``stream`` chunk by chunk, raising BodyTooLarge as soon as the
+    output passes ``limit`` bytes so a small zip bomb never expands in memory."""
+    if encoding in ("gzip", "x-gzip"):
+        chunks = _zlib_chunks(stream, 16 + zlib.MAX_WBITS, limit, multi_member=True)
+    elif encoding == "deflate":
+        # RFC 9110 deflate is zlib-wrapped; raw deflate is accepted as well
+        head = stream.read(2)
+        raw = len(head) < 2 or (head[0] & 0x0F) != 8 or int.from_bytes(head, "big") % 31
+        stream = io.BufferedReader(_Prefixed(head, stream))
+        chunks = _zlib_chunks(stream, -zlib.MAX_WBITS if raw else zlib.MAX_WBITS, limit)
+    elif encoding == "zstd":
+        chunks = _zstd_chunks(stream, limit)
+    else:
+        raise ValueError(f"unsupported Content-Encoding: {encoding}")
+    return b"".join(chunks)
+
+
+class _Prefixed(io.RawIOBase):
+    """Replay already-read bytes in front of a stream."""
+
+    def __init__(self, head: bytes, stream):
+        self.head = head
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.head:
+            n = min(len(b), len(self.head))
+            b[:n] = self.head[:n]
+            self.head = self.head[n:]
+            return n
+        data = self.stream.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class DecompressIngestBodyMiddleware:
+    """Accept ``Content-Encoding: gzip|deflate|zstd`` bodies on ingest endpoints.
+
+    The body is decompressed before DRF sees it, so the JSON parser (and the
+    envelope parser reading ``request.body``) work on plain bytes. Output is
+    capped at INGEST_MAX_DECOMPRESSED_BYTES (413 above it, 400 on corrupt input).
+    Async-capable, so async ingest views are not pushed onto a thread; there
+    the decompression itself runs in a worker thread to keep the loop free.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self._encoding(request):
+            error = self._decompress(request)
+            if error is not None:
+                return error
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self._encoding(request):
+            error = await sync_to_async(self._decompress, thread_sensitive=False)(request)
+            if error is not None:
+                return error
+        return await self.get_response(request)
+
+    def _encoding(self, request) -> str | None:
+        encoding = request.META.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if encoding and encoding != "identity" and request.path.startswith(INGEST_PATH_PREFIXES):
+            return encoding
+        return None
+
+    def _decompress(self, request):
+        """Replace the request body in place; returns an error response or None."""
+        encoding = self._encoding(request)
+        try:
+            body = decompress_stream(request, encoding, settings.INGEST_MAX_DECOMPRESSED_BYTES)
+        except BodyTooLarge:
+            return JsonResponse(
+                {"error": f"Decompressed body exceeds {settings.INGEST_MAX_DECOMPRESSED_BYTES} bytes"},
+                status=413,
+            )
+        except ValueError as e:
+            status = 415 if "unsupported" in str(e) else 400
+            return JsonResponse({"error": str(e)}, status=status)
+        except (zlib.error, zstandard.ZstdError) as e:
+            return JsonResponse({"error": f"Invalid {encoding} body: {e}"}, status=400)
+        # Same bookkeeping HttpRequest.body does after reading the stream
+        request._body = body
+        request._stream = io.BytesIO(body)
+        request.META["CONTENT_LENGTH"] = str(len(body))
+        del request.META["HTTP_CONTENT_ENCODING"]
+        return None
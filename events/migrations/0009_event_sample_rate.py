@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0008_workflow_and_tags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='sample_rate',
+            field=models.FloatField(default=1.0),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations, models, transaction
+
+
+# Rows per backfill UPDATE; each chunk commits on its own so the table is
+# never locked for the whole backfill
+BACKFILL_CHUNK = 5000
+
+
+def backfill_fingerprint_hash(apps, schema_editor):
+    Group = apps.get_model("events", "Group")
+    table = schema_editor.quote_name(Group._meta.db_table)
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+        low, high = cur.fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_CHUNK):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            with schema_editor.connection.cursor() as cur:
+                # Same value as grouping.fingerprint_hash: md5 of the UTF-8 fingerprint
+                cur.execute(
+                    f"UPDATE {table} SET fingerprint_hash = decode(md5(fingerprint), 'hex') "
+                    f"WHERE id >= %s AND id < %s AND fingerprint_hash IS NULL",
+                    [start, start + BACKFILL_CHUNK],
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("events", "0009_event_sample_rate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='fingerprint_hash',
+            field=models.BinaryField(editable=False, max_length=16, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprint_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='group',
+            name='fingerprint_hash',
+            field=models.BinaryField(editable=False, max_length=16),
+        ),
+        migrations.AlterUniqueTogether(
+            name='group',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='fingerprint',
+            field=models.CharField(max_length=512),
+        ),
+        migrations.AddConstraint(
+            model_name='group',
+            constraint=models.UniqueConstraint(fields=('project', 'fingerprint_hash'), name='events_group_project_fingerprint_hash'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0010_group_fingerprint_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='grouping_config',
+            field=models.CharField(default='message:1', max_length=32),
+        ),
+    ]
@@ -0,0 +1,27 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_group_grouping_config'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FingerprintRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.IntegerField(default=0)),
+                ('field', models.CharField(default='message', max_length=100)),
+                ('pattern', models.CharField(default='*', max_length=500)),
+                ('fingerprint', models.CharField(max_length=500)),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_rules', to='events.project')),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_fingerprintrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='merged_into',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='merged_groups', to='events.group'),
+        ),
+        migrations.CreateModel(
+            name='GroupSignature',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='events.group')),
+                ('minhash', models.BinaryField()),
+                ('band_keys', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+                ('indexed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['band_keys'], name='events_groupsig_bands_gin')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupMergeSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merge_suggestions', to='events.group')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merge_suggestions', to='events.project')),
+                ('similar_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.group')),
+            ],
+            options={
+                'unique_together': {('group', 'similar_group')},
+            },
+        ),
+    ]
@@ -1,7 +1,11 @@
 import secrets
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils import timezone
 
+from .grouping import fingerprint_hash as compute_fingerprint_hash
+
 
 class Project(models.Model):
     name = models.CharField(max_length=200, unique=True)
@@ -39,6 +43,8 @@ class Event(models.Model):
     tags = models.JSONField(default=list, blank=True)
     stack = models.TextField(null=True, blank=True)
     symbolicated = models.JSONField(default=dict, blank=True)
+    # Fraction of events kept by spike protection when this one was stored
+    sample_rate = models.FloatField(default=1.0)
 
     def __str__(self) -> str:  # pragma: no cover
         return f"{self.project.slug}: {self.level} - {self.message[:30]}"
@@ -46,7 +52,9 @@ class Event(models.Model):
 
 class Group(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="groups")
-    fingerprint = models.CharField(max_length=512, db_index=True)
+    # Readable key; lookups and uniqueness go through fingerprint_hash
+    fingerprint = models.CharField(max_length=512)
+    fingerprint_hash = models.BinaryField(max_length=16, editable=False)
     title = models.CharField(max_length=255)
     level = models.CharField(max_length=20, default="error")
     count = models.PositiveIntegerField(default=0)
@@ -64,13 +72,70 @@ class Group(models.Model):
     resolved_at = models.DateTimeField(null=True, blank=True)
     assignee = models.CharField(max_length=200, blank=True, default="")
     is_bookmarked = models.BooleanField(default=False)
+    # Grouping strategy and version that produced the fingerprint (grouping.GROUPING_CONFIGS)
+    grouping_config = models.CharField(max_length=32, default="message:1")
+    # Set when merged: new events for this fingerprint count towards the target
+    merged_into = models.ForeignKey(
+        "self", null=True, blank=True, on_delete=models.SET_NULL, related_name="merged_groups"
+    )
 
     class Meta:
-        unique_together = ("project", "fingerprint")
+        constraints = [
+            models.UniqueConstraint(fields=["project", "fingerprint_hash"], name="events_group_project_fingerprint_hash"),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover
         return f"{self.project.slug}:{self.title}"
 
+    def save(self, *args, **kwargs):
+        self.fingerprint_hash = compute_fingerprint_hash(self.fingerprint)
+        return super().save(*args, **kwargs)
+
+
+class GroupSignature(models.Model):
+    """MinHash signature of a group and its LSH band keys (see similarity.py);
+    groups sharing any band key are near-duplicate candidates."""
+    group = models.OneToOneField(Group, on_delete=models.CASCADE, primary_key=True, related_name="signature")
+    minhash = models.BinaryField()
+    band_keys = ArrayField(models.BigIntegerField())
+    indexed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [GinIndex(fields=["band_keys"], name="events_groupsig_bands_gin")]
+
+
+class GroupMergeSuggestion(models.Model):
+    """``group`` looks like a near duplicate of the older ``similar_group``."""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="merge_suggestions")
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="merge_suggestions")
+    similar_group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="+")
+    similarity = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("group", "similar_group")
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.group_id}~{self.similar_group_id}:{self.similarity:.2f}"
+
+
+class FingerprintRule(models.Model):
+    """Project grouping override: events whose ``field`` matches the glob
+    ``pattern`` group by the rendered ``fingerprint`` template. Rules apply in
+    (order, id) order and the first match wins; see fingerprint_rules.py."""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="fingerprint_rules")
+    order = models.IntegerField(default=0)
+    # message, exception_type, level, environment, release or tags.<name>
+    field = models.CharField(max_length=100, default="message")
+    pattern = models.CharField(max_length=500, default="*")
+    fingerprint = models.CharField(max_length=500)
+    title = models.CharField(max_length=255, blank=True, default="")
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.project_id}:{self.field}:{self.pattern}"
+
 
 class Release(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="releases")
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.http import Http404
+
+from .cache import MISSING, TTLCache
+from .models import Project
+
+
+# ("token", ingest_token) / ("slug", slug) -> Project, or None for unknown keys.
+# Saves and deletes invalidate entries in the current process; other workers
+# converge within PROJECT_CACHE_TTL (PROJECT_CACHE_NEGATIVE_TTL for misses).
+_projects = TTLCache(maxsize=settings.PROJECT_CACHE_SIZE, ttl=settings.PROJECT_CACHE_TTL)
+
+
+def _resolve(key: tuple, lookup: dict) -> Project | None:
+    project = _projects.get(key)
+    if project is not MISSING:
+        return project
+    project = Project.objects.filter(**lookup).first()
+    _projects.set(key, project, ttl=None if project else settings.PROJECT_CACHE_NEGATIVE_TTL)
+    return project
+
+
+def get_project_by_token(token: str) -> Project | None:
+    return _resolve(("token", token), {"ingest_token": token})
+
+
+async def aget_project_by_token(token: str) -> Project | None:
+    """``get_project_by_token`` for async views: cache hits never leave the loop."""
+    key = ("token", token)
+    project = _projects.get(key)
+    if project is not MISSING:
+        return project
+    project = await Project.objects.filter(ingest_token=token).afirst()
+    _projects.set(key, project, ttl=None if project else settings.PROJECT_CACHE_NEGATIVE_TTL)
+    return project
+
+
+def get_project_by_slug(slug: str) -> Project | None:
+    return _resolve(("slug", slug), {"slug": slug})
+
+
+def project_by_token_or_404(token: str) -> Project:
+    project = get_project_by_token(token)
+    if project is None:
+        raise Http404("No Project matches the given query.")
+    return project
+
+
+def project_by_slug_or_404(slug: str) -> Project:
+    project = get_project_by_slug(slug)
+    if project is None:
+        raise Http404("No Project matches the given query.")
+    return project
+
+
+def invalidate_project(project: Project):
+    """Forget every cached entry for ``project``, including stale tokens/slugs
+    and negative entries for its current token/slug."""
+    _projects.pop(("token", project.ingest_token))
+    _projects.pop(("slug", project.slug))
+    _projects.discard_where(lambda p: p is not None and p.pk == project.pk)
@@ -1,33 +1,289 @@
+import asyncio
+import math
 import os
+import threading
 import time
-from typing import Tuple
+from typing import Dict, NamedTuple, Tuple
 
 import redis as redis_lib
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
 
 
 _redis_client = None
+_async_redis = (None, None, {})  # (event loop, client, scripts): asyncio clients are loop-bound
+
+
+def _redis_url() -> str:
+    return os.environ.get("CELERY_BROKER_URL") or os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 
 
 def get_redis():
     global _redis_client
     if _redis_client is None:
-        url = os.environ.get("CELERY_BROKER_URL") or os.environ.get("REDIS_URL", "redis://localhost:6379/0")
-        _redis_client = redis_lib.Redis.from_url(url)
+        _redis_client = redis_lib.Redis.from_url(_redis_url())
     return _redis_client
 
 
-def check_rate_limit(scope_key: str, limit: int = 120, window_seconds: int = 60) -> Tuple[bool, int]:
+def get_async_redis():
+    """asyncio Redis client for the running event loop (async ingest views)."""
+    global _async_redis
+    loop = asyncio.get_running_loop()
+    if _async_redis[0] is not loop:
+        _async_redis = (loop, aioredis.Redis.from_url(_redis_url()), {})
+    return _async_redis[1]
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the quota is fully available again
+    retry_after: float  # seconds until a request of the same cost would pass (0 if allowed)
+
+    def headers(self) -> Dict[str, str]:
+        h = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            h["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return h
+
+
+# Every algorithm is a single Lua script, i.e. one atomic Redis round trip.
+# Float results are returned as strings because Redis truncates Lua numbers.
+
+# KEYS[1]=window key; ARGV: cost, ttl
+_FIXED_WINDOW_LUA = """
+local count = redis.call('INCRBY', KEYS[1], ARGV[1])
+if count == tonumber(ARGV[1]) then redis.call('EXPIRE', KEYS[1], ARGV[2]) end
+return count
+"""
+
+# Sliding window counter: the previous window is weighted by how much of it
+# still overlaps the sliding window. KEYS[1]=current, KEYS[2]=previous window;
+# ARGV: limit, window, cost, elapsed seconds in current window
+_SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local elapsed = tonumber(ARGV[4])
+local cur = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+local used = prev * (window - elapsed) / window + cur
+if used + cost > limit then
+  local retry = window - elapsed
+  if cur + cost <= limit and prev > 0 then
+    retry = (used + cost - limit) / prev * window
+  end
+  return {0, tostring(limit - used), tostring(retry)}
+end
+redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIRE', KEYS[1], window * 2)
+return {1, tostring(limit - used - cost), '0'}
+"""
+
+# Token bucket holding up to `capacity` tokens, refilled at `rate` tokens/s.
+# KEYS[1]=bucket hash; ARGV: capacity, rate, now, cost
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+  tokens = capacity
+  ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens), tostring(retry)}
+"""
+
+# Lease-based two-tier quota: release the caller's unused lease units, then
+# grant up to `want` more without letting reservations pass `cap`.
+# KEYS[1]=window key; ARGV: release, want, cost, cap, ttl
+_LEASE_LUA = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local release = tonumber(ARGV[1])
+if release > 0 then
+  used = redis.call('DECRBY', KEYS[1], release)
+end
+local want = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local grant = math.min(want, tonumber(ARGV[4]) - used)
+if grant < cost then
+  grant = 0
+else
+  used = redis.call('INCRBY', KEYS[1], grant)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return {grant, used}
+"""
+
+_scripts = {}
+
+
+def _script(name: str, source: str):
+    # register_script runs EVALSHA and falls back to EVAL on NOSCRIPT
+    if name not in _scripts:
+        _scripts[name] = get_redis().register_script(source)
+    return _scripts[name]
+
+
+def _async_script(name: str, source: str):
+    # Scripts hold their client, so they are registered per event loop too
+    client = get_async_redis()
+    scripts = _async_redis[2]
+    if name not in scripts:
+        scripts[name] = client.register_script(source)
+    return scripts[name]
+
+
+# Each Redis-backed algorithm returns (script name, source, keys, args, finish):
+# the sync and async entry points run the script their own way and pass the
+# reply to ``finish`` to build the result.
+
+def _fixed_window(scope_key: str, limit: int, window_seconds: int, cost: int, now: float):
+    window = int(now) // window_seconds
+    key = f"rate:{scope_key}:{window}"
+    reset_after = (window + 1) * window_seconds - now
+
+    def finish(reply) -> RateLimitResult:
+        count = int(reply)
+        allowed = count <= limit
+        return RateLimitResult(allowed, limit, limit - count, reset_after, 0 if allowed else reset_after)
+
+    return "fixed", _FIXED_WINDOW_LUA, [key], [cost, window_seconds], finish
+
+
+def _sliding_window(scope_key: str, limit: int, window_seconds: int, cost: int, now: float):
+    window = int(now) // window_seconds
+    elapsed = now - window * window_seconds
+    keys = [f"rate:sw:{scope_key}:{window}", f"rate:sw:{scope_key}:{window - 1}"]
+
+    def finish(reply) -> RateLimitResult:
+        allowed, remaining, retry = reply
+        return RateLimitResult(bool(allowed), limit, int(float(remaining)), window_seconds - elapsed, float(retry))
+
+    return "sliding", _SLIDING_WINDOW_LUA, keys, [limit, window_seconds, cost, f"{elapsed:.6f}"], finish
+
+
+def _token_bucket(scope_key: str, limit: int, window_seconds: int, cost: int, now: float):
+    rate = limit / window_seconds
+
+    def finish(reply) -> RateLimitResult:
+        allowed, tokens, retry = reply
+        tokens = float(tokens)
+        return RateLimitResult(bool(allowed), limit, int(tokens), (limit - tokens) / rate, float(retry))
+
+    return "token_bucket", _TOKEN_BUCKET_LUA, [f"rate:tb:{scope_key}"], [limit, f"{rate:.9f}", f"{now:.6f}", cost], finish
+
+
+class _Lease:
+    __slots__ = ("window", "units", "used", "synced_at", "exhausted", "lock")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.units = 0  # leased from Redis and not consumed yet
+        self.used = 0  # global usage seen at the last sync
+        self.synced_at = 0.0
+        self.exhausted = False  # the last sync could not cover the request
+        self.lock = threading.Lock()  # held across the sync round trip
+
+
+_leases: Dict[str, _Lease] = {}
+_leases_lock = threading.Lock()  # guards _leases only
+
+
+def _local_lease(scope_key: str, limit: int, window_seconds: int, cost: int, now: float) -> RateLimitResult:
+    """Two-tier quota: admit from a per-process lease and talk to Redis only
+    when the lease runs out or every RATE_LIMIT_LOCAL_SYNC_MS. Each sync hands
+    back unused units and leases a new slice (RATE_LIMIT_LOCAL_LEASE_FRACTION
+    of the limit). Reservations never exceed limit + RATE_LIMIT_LOCAL_MAX_OVERSHOOT
+    (a fraction of the limit), which bounds how far admissions can overshoot.
+    Once the quota is exhausted, requests are denied locally until the next
+    sync is due or the window rolls over.
     """
-    Simple fixed-window limiter using Redis INCR+EXPIRE.
-    Returns (allowed, remaining).
+    window = int(now) // window_seconds
+    reset_after = (window + 1) * window_seconds - now
+    sync_interval = settings.RATE_LIMIT_LOCAL_SYNC_MS / 1000.0
+    with _leases_lock:
+        lease = _leases.get(scope_key)
+        if lease is None or lease.window != window:
+            # Units leased in an older window expire with its key
+            lease = _leases[scope_key] = _Lease(window)
+    with lease.lock:
+        if now - lease.synced_at < sync_interval:
+            if lease.units >= cost:
+                lease.units -= cost
+                return RateLimitResult(True, limit, limit - lease.used + lease.units, reset_after, 0)
+            if lease.exhausted:
+                return RateLimitResult(False, limit, limit - lease.used, reset_after, reset_after)
+        lease_size = max(cost, int(limit * settings.RATE_LIMIT_LOCAL_LEASE_FRACTION))
+        cap = limit + int(limit * settings.RATE_LIMIT_LOCAL_MAX_OVERSHOOT)
+        grant, used = _script("lease", _LEASE_LUA)(
+            keys=[f"rate:lease:{scope_key}:{window}"],
+            args=[lease.units, lease_size, cost, cap, window_seconds],
+        )
+        lease.units = int(grant)
+        lease.used = int(used)
+        lease.synced_at = now
+        lease.exhausted = lease.units < cost
+        if lease.exhausted:
+            return RateLimitResult(False, limit, limit - lease.used, reset_after, reset_after)
+        lease.units -= cost
+        return RateLimitResult(True, limit, limit - lease.used + lease.units, reset_after, 0)
+
+
+ALGORITHMS = {
+    "fixed": _fixed_window,
+    "sliding": _sliding_window,
+    "token_bucket": _token_bucket,
+    "local": _local_lease,
+}
+
+
+def rate_limit(scope_key: str, limit: int = 120, window_seconds: int = 60, cost: int = 1, algorithm: str | None = None) -> RateLimitResult:
+    """Charge ``cost`` units against ``scope_key`` (``limit`` per ``window_seconds``).
+    ``algorithm`` defaults to RATE_LIMIT_ALGORITHM: "sliding", "token_bucket",
+    "fixed" or "local" (per-process leases synced to Redis in batches).
     """
-    r = get_redis()
-    now = int(time.time())
-    window = now // window_seconds
-    key = f"rate:{scope_key}:{window}"
-    count = r.incr(key)
-    if count == 1:
-        r.expire(key, window_seconds)
-    remaining = max(0, limit - int(count))
-    return (count <= limit), remaining
+    algorithm = algorithm or settings.RATE_LIMIT_ALGORITHM
+    if algorithm == "local":
+        return _local_lease(scope_key, limit, window_seconds, cost, time.time())
+    name, source, keys, args, finish = ALGORITHMS[algorithm](scope_key, limit, window_seconds, cost, time.time())
+    return finish(_script(name, source)(keys=keys, args=args))
 
+
+async def arate_limit(scope_key: str, limit: int = 120, window_seconds: int = 60, cost: int = 1, algorithm: str | None = None) -> RateLimitResult:
+    """``rate_limit`` for async views, on the asyncio Redis client."""
+    algorithm = algorithm or settings.RATE_LIMIT_ALGORITHM
+    if algorithm == "local":
+        # Mostly answered from the in-process lease; syncs hold a thread lock
+        return await sync_to_async(_local_lease, thread_sensitive=False)(scope_key, limit, window_seconds, cost, time.time())
+    name, source, keys, args, finish = ALGORITHMS[algorithm](scope_key, limit, window_seconds, cost, time.time())
+    return finish(await _async_script(name, source)(keys=keys, args=args))
+
+
+def check_rate_limit(scope_key: str, limit: int = 120, window_seconds: int = 60, cost: int = 1) -> Tuple[bool, int]:
+    """
+    Compatibility wrapper around ``rate_limit``.
+    Returns (allowed, remaining).
+    """
+    result = rate_limit(scope_key, limit, window_seconds, cost)
+    return result.allowed, max(0, result.remaining)
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .cache import MISSING, TTLCache
+from .models import Release
+
+
+# (project_id, version, environment) -> release id
+_release_ids = TTLCache(maxsize=settings.RELEASE_CACHE_SIZE, ttl=settings.RELEASE_CACHE_TTL)
+
+
+def resolve_release_id(project_id: int, version: str, environment: str) -> int:
+    """Return the id of the release, creating it on first sight.
+    Misses cost one INSERT ... ON CONFLICT ... RETURNING round trip; the
+    no-op DO UPDATE makes the statement return the existing row's id.
+    """
+    key = (project_id, version, environment)
+    release_id = _release_ids.get(key)
+    if release_id is not MISSING:
+        return release_id
+    table = Release._meta.db_table
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO {table} (project_id, version, environment, created_at)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (project_id, version, environment) DO UPDATE SET version = EXCLUDED.version
+            RETURNING id
+            """,
+            [project_id, version, environment, timezone.now()],
+        )
+        release_id = cur.fetchone()[0]
+    _release_ids.set(key, release_id)
+    return release_id
+
+
+def forget_release(release: Release):
+    _release_ids.pop((release.project_id, release.version, release.environment))
+
+
+def forget_release_ids(project_id: int, keys):
+    """Drop cached ids for ``(version, environment)`` keys, e.g. after an insert
+    hit a release that another worker deleted."""
+    for version, environment in keys:
+        _release_ids.pop((project_id, version, environment))
@@ -0,0 +1,25 @@
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+_fallback = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Drop-in for DRF's JSONRenderer backed by orjson.
+
+    orjson serializes dicts, lists, datetimes and UUIDs natively; anything else
+    (Decimal, lazy translations, querysets, ...) goes through DRF's encoder.
+    """
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        option = orjson.OPT_NON_STR_KEYS
+        if (renderer_context or {}).get("indent") or "indent=" in (accepted_media_type or ""):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_fallback.default, option=option)
@@ -0,0 +1,97 @@
+import math
+import random
+import time
+from typing import List, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .ratelimit import RateLimitResult, arate_limit, get_redis, rate_limit
+
+
+# Spike protection: once a scope is over its rate limit, events are kept with
+# probability limit / offered load instead of being rejected. Each kept event
+# carries its sample rate and counts 1 / rate towards its group, so group
+# counts stay unbiased while stored volume stays near the limit.
+
+
+def spike_protection_enabled() -> bool:
+    return settings.SPIKE_PROTECTION
+
+
+def _rate_key(project_id: int) -> str:
+    return f"spike:rate:{project_id}"
+
+
+def _spike_sample_rate(project_id: int, scope_key: str, limit: int, window_seconds: int, cost: int) -> float:
+    """Count ``cost`` over-limit units and derive the sample rate from the
+    sliding-window estimate of the excess: limit / (limit + excess)."""
+    now = time.time()
+    window = int(now) // window_seconds
+    elapsed = now - window * window_seconds
+    cur_key, prev_key = f"spike:{scope_key}:{window}", f"spike:{scope_key}:{window - 1}"
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.incrby(cur_key, cost)
+    pipe.expire(cur_key, window_seconds * 2)
+    pipe.get(prev_key)
+    cur, _, prev = pipe.execute()
+    excess = int(prev or 0) * (window_seconds - elapsed) / window_seconds + int(cur)
+    rate = max(settings.SPIKE_MIN_SAMPLE_RATE, min(1.0, limit / (limit + excess)))
+    get_redis().set(_rate_key(project_id), f"{rate:.6f}", ex=window_seconds)
+    return rate
+
+
+def admit(project, scope_key: str, limit: int, window_seconds: int = 60, cost: int = 1) -> Tuple[RateLimitResult, float | None]:
+    """Charge the rate limit and decide how to treat the request.
+
+    Returns the rate-limit result (for X-RateLimit-* headers) and the sample
+    rate: 1.0 within the limit, below 1.0 when spike protection samples the
+    request, or None when it must be rejected with 429.
+    """
+    result = rate_limit(scope_key, limit, window_seconds, cost)
+    if result.allowed:
+        return result, 1.0
+    if not spike_protection_enabled():
+        return result, None
+    try:
+        rate = _spike_sample_rate(project.id, scope_key, limit, window_seconds, cost)
+    except Exception as e:
+        print(f"Spike protection unavailable: {e}")
+        return result, None
+    # Sampled requests are accepted, so no Retry-After
+    return result._replace(allowed=True, retry_after=0), rate
+
+
+async def aadmit(project, scope_key: str, limit: int, window_seconds: int = 60, cost: int = 1) -> Tuple[RateLimitResult, float | None]:
+    """``admit`` for async views; only the rare over-limit path leaves the loop."""
+    result = await arate_limit(scope_key, limit, window_seconds, cost)
+    if result.allowed:
+        return result, 1.0
+    if not spike_protection_enabled():
+        return result, None
+    try:
+        rate = await sync_to_async(_spike_sample_rate, thread_sensitive=False)(
+            project.id, scope_key, limit, window_seconds, cost
+        )
+    except Exception as e:
+        print(f"Spike protection unavailable: {e}")
+        return result, None
+    return result._replace(allowed=True, retry_after=0), rate
+
+
+def sample(payloads: List[dict], rate: float) -> List[dict]:
+    if rate >= 1.0:
+        return payloads
+    return [p for p in payloads if random.random() < rate]
+
+
+def weighted_count(weight: float) -> int:
+    """Round a summed 1/rate weight to an event count without bias."""
+    whole = math.floor(weight)
+    return int(whole + (random.random() < weight - whole))
+
+
+def current_sample_rate(project_id: int) -> float:
+    """The sample rate last applied to the project, or 1.0 outside a spike."""
+    value = get_redis().get(_rate_key(project_id))
+    return float(value) if value else 1.0
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Event, Project, Group, Release, Artifact, AlertRule, AlertTarget, Session, ReleaseDeployment, Comment
+from .fingerprint_rules import parse_template, validate_field
+from .models import Event, Project, Group, Release, Artifact, AlertRule, AlertTarget, Session, ReleaseDeployment, Comment, FingerprintRule, GroupMergeSuggestion
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -25,6 +26,7 @@ class EventSerializer(serializers.ModelSerializer):
             "tags",
             "stack",
             "symbolicated",
+            "sample_rate",
         ]
 
 
@@ -43,7 +45,19 @@ class GroupSerializer(serializers.ModelSerializer):
             "resolved_at",
             "assignee",
             "is_bookmarked",
+            "grouping_config",
+            "merged_into",
         ]
+        read_only_fields = ["grouping_config", "merged_into"]
+
+
+class GroupMergeSuggestionSerializer(serializers.ModelSerializer):
+    group = GroupSerializer(read_only=True)
+    similar_group = GroupSerializer(read_only=True)
+
+    class Meta:
+        model = GroupMergeSuggestion
+        fields = ["id", "project", "group", "similar_group", "similarity", "created_at"]
 
 
 class ReleaseSerializer(serializers.ModelSerializer):
@@ -77,6 +91,38 @@ class AlertRuleSerializer(serializers.ModelSerializer):
         ]
 
 
+class FingerprintRuleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FingerprintRule
+        fields = [
+            "id",
+            "project",
+            "order",
+            "field",
+            "pattern",
+            "fingerprint",
+            "title",
+            "active",
+            "created_at",
+        ]
+        read_only_fields = ["created_at"]
+
+    def validate_field(self, value):
+        try:
+            return validate_field(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_fingerprint(self, value):
+        try:
+            parse_template(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    validate_title = validate_fingerprint
+
+
 class AlertTargetSerializer(serializers.ModelSerializer):
     class Meta:
         model = AlertTarget
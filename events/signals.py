@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .counters import forget_group_id
+from .fingerprint_rules import forget_rules
+from .models import FingerprintRule, Group, Project, Release
+from .projects import invalidate_project
+from .releases import forget_release
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance: Group, **kwargs):
+    forget_group_id(instance.project_id, instance.fingerprint)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance: Project, **kwargs):
+    invalidate_project(instance)
+
+
+@receiver(post_delete, sender=Release)
+def release_deleted(sender, instance: Release, **kwargs):
+    forget_release(instance)
+
+
+@receiver(post_save, sender=FingerprintRule)
+@receiver(post_delete, sender=FingerprintRule)
+def fingerprint_rule_changed(sender, instance: FingerprintRule, **kwargs):
+    forget_rules(instance.project_id)
@@ -0,0 +1,197 @@
+import hashlib
+import random
+import re
+import struct
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .cache import MISSING, TTLCache
+from .counters import forget_group_id
+from .grouping import frame_component, is_in_app, normalize_message
+from .models import AlertState, Comment, Event, Group, GroupMergeSuggestion, GroupSignature
+from .symbolication import parse_stacktrace
+
+
+# Near-duplicate groups: each group gets a MinHash signature over its title
+# words (and word pairs) plus the in-app frames of its latest stored event.
+# The signature is cut into BANDS bands of ROWS values; each band hashes to a
+# band key stored in a GIN-indexed array, so candidates are the groups sharing
+# at least one key - one index lookup instead of comparing against every group.
+# With 16 bands of 4 rows, pairs at Jaccard 0.8 share a band ~99.9% of the
+# time, pairs at 0.3 ~12%; candidates are then scored on the full signature.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MAX_CANDIDATES = 200
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD_RE = re.compile(r"<\w+>|[^\W_]+", re.UNICODE)
+_SIG = struct.Struct(f"<{NUM_PERM}Q")
+
+# project_id -> {merged fingerprint: target fingerprint}. Ingest rewrites
+# merged fingerprints before grouping, so their events are throttled, counted
+# and buffered as the target's. Merges in other workers apply within
+# MERGE_MAP_TTL; until then the upsert leaves merged rows alone and ingest
+# redirects their events to the target.
+MERGE_MAP_TTL = 10
+_merge_maps = TTLCache(maxsize=settings.PROJECT_CACHE_SIZE, ttl=MERGE_MAP_TTL)
+
+
+def similarity_enabled() -> bool:
+    return settings.GROUP_SIMILARITY_ENABLED
+
+
+def merged_fingerprints(project_id: int) -> Dict[str, str]:
+    merges = _merge_maps.get(project_id)
+    if merges is MISSING:
+        merges = dict(
+            Group.objects.filter(project_id=project_id, merged_into__isnull=False).values_list(
+                "fingerprint", "merged_into__fingerprint"
+            )
+        )
+        _merge_maps.set(project_id, merges)
+    return merges
+
+
+def _event_frames(event: Optional[Event]) -> List[Dict[str, Any]]:
+    if event is None:
+        return []
+    frames = (event.symbolicated or {}).get("frames") or (event.payload or {}).get("frames")
+    if isinstance(frames, list):
+        return frames
+    return parse_stacktrace(event.stack) if isinstance(event.stack, str) else []
+
+
+def group_tokens(title: str, frames: List[Dict[str, Any]] | None = None) -> Set[str]:
+    """Shingles of a group: lowercased title words and adjacent word pairs,
+    plus ``frame:<module>:<function>`` for each in-app frame."""
+    words = _WORD_RE.findall(normalize_message(title or "").lower())
+    tokens = set(words)
+    tokens.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    tokens.update(
+        f"frame:{frame_component(f)}" for f in frames or [] if isinstance(f, dict) and is_in_app(f)
+    )
+    return tokens
+
+
+def minhash(tokens: Set[str]) -> Tuple[int, ...]:
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little") for t in tokens]
+    if not hashes:
+        return (_PRIME,) * NUM_PERM
+    return tuple(min([(a * h + b) % _PRIME for h in hashes]) for a, b in _PERMS)
+
+
+def band_keys(project_id: int, signature: Tuple[int, ...]) -> List[int]:
+    """One signed 64-bit key per band, salted with the project so a lookup
+    never crosses projects."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<QQ{ROWS}Q", project_id, band, *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the two token sets."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def index_group(group: Group) -> GroupSignature:
+    latest = group.events.order_by("-id").only("stack", "payload", "symbolicated").first()
+    signature = minhash(group_tokens(group.title, _event_frames(latest)))
+    row, _ = GroupSignature.objects.update_or_create(
+        group=group,
+        defaults={
+            "minhash": _SIG.pack(*signature),
+            "band_keys": band_keys(group.project_id, signature),
+            "indexed_at": timezone.now(),
+        },
+    )
+    return row
+
+
+def similar_groups(group: Group, threshold: float | None = None, limit: int = 10) -> List[Tuple[Group, float]]:
+    """Unmerged groups of the same project whose estimated similarity to
+    ``group`` is at least ``threshold``, most similar first."""
+    threshold = settings.GROUP_SIMILARITY_THRESHOLD if threshold is None else threshold
+    row = GroupSignature.objects.filter(group=group).first() or index_group(group)
+    signature = _SIG.unpack(bytes(row.minhash))
+    candidates = (
+        GroupSignature.objects.filter(band_keys__overlap=list(row.band_keys), group__merged_into__isnull=True)
+        .exclude(group_id=group.id)
+        .select_related("group")[:MAX_CANDIDATES]
+    )
+    scored = [(c.group, estimate_similarity(signature, _SIG.unpack(bytes(c.minhash)))) for c in candidates]
+    scored = [(g, s) for g, s in scored if s >= threshold]
+    scored.sort(key=lambda gs: (-gs[1], gs[0].id))
+    return scored[:limit]
+
+
+def merge_groups(source: Group, target: Group) -> Group:
+    """Fold ``source`` into ``target``: its events, comments and count move
+    over, and later events with its fingerprint count towards ``target``
+    (see ``merged_fingerprints``)."""
+    if target.merged_into_id:
+        target = target.merged_into
+    if source.id == target.id or source.project_id != target.project_id:
+        raise ValueError("groups must be distinct and belong to the same project")
+    with transaction.atomic():
+        # Both rows locked in id order, then re-checked: a concurrent merge may
+        # have merged either group away since they were read
+        locked = Group.objects.select_for_update().filter(id__in=[source.id, target.id]).order_by("id").in_bulk()
+        source, target = locked.get(source.id), locked.get(target.id)
+        if source is None or target is None:
+            raise ValueError("group no longer exists")
+        if source.merged_into_id:
+            raise ValueError("group is already merged")
+        if target.merged_into_id:
+            raise ValueError("target group has been merged into another group")
+        Event.objects.filter(group=source).update(group=target)
+        Comment.objects.filter(group=source).update(group=target)
+        AlertState.objects.filter(group=source).delete()
+        Group.objects.filter(merged_into=source).update(merged_into=target)
+        Group.objects.filter(id=target.id).update(
+            count=F("count") + source.count,
+            first_seen=Least(F("first_seen"), source.first_seen),
+            last_seen=Greatest(F("last_seen"), source.last_seen),
+        )
+        Group.objects.filter(id=source.id).update(merged_into=target)
+        GroupMergeSuggestion.objects.filter(group=source).delete()
+        GroupMergeSuggestion.objects.filter(similar_group=source).delete()
+    # Buffered deltas still keyed by the source are moved over by counters.flush
+    forget_group_id(source.project_id, source.fingerprint)
+    _merge_maps.pop(source.project_id)
+    target.refresh_from_db()
+    return target
+
+
+def index_pending(limit: int | None = None) -> Dict[str, int]:
+    """Sign groups not indexed yet (oldest first); record a merge suggestion
+    for the best older match, or merge into it above the auto-merge threshold."""
+    limit = limit or settings.GROUP_SIMILARITY_BATCH_SIZE
+    auto_merge = settings.GROUP_SIMILARITY_AUTO_MERGE_THRESHOLD
+    stats = {"indexed": 0, "suggested": 0, "merged": 0}
+    pending = Group.objects.filter(signature__isnull=True, merged_into__isnull=True).order_by("id")[:limit]
+    for group in pending:
+        index_group(group)
+        stats["indexed"] += 1
+        older = [(g, s) for g, s in similar_groups(group, limit=MAX_CANDIDATES) if g.id < group.id]
+        if not older:
+            continue
+        best, score = older[0]
+        if auto_merge > 0 and score >= auto_merge:
+            merge_groups(group, best)
+            stats["merged"] += 1
+        else:
+            GroupMergeSuggestion.objects.update_or_create(
+                group=group, similar_group=best, defaults={"project_id": group.project_id, "similarity": score}
+            )
+            stats["suggested"] += 1
+    return stats
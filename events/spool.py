@@ -0,0 +1,235 @@
+"""Append-only local spool for Kafka records that could not be delivered.
+
+Records are written to segment files as ``<4-byte big-endian length><json>``
+where the JSON holds ``{"topic": ..., "value": ...}``. Each process appends to
+its own active segment (``seg-<created_ms>-<host>-<pid>.log``) and rolls it at
+KAFKA_SPOOL_SEGMENT_BYTES. A background thread replays sealed segments, oldest
+first, once the broker is reachable again. Writers hold an exclusive ``flock``
+on their active segment until they seal it, and replayers hold one on the
+segment they replay, so processes in different containers (separate PID
+namespaces) can share one spool directory: the kernel drops the lock when its
+holder dies, and a segment is only replayed once no one holds it.
+"""
+import fcntl
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+_HEADER = struct.Struct(">I")
+
+_lock = threading.Lock()
+_active = None  # (path, file object)
+_last_fsync = 0.0
+_replayer = None
+_stats = {"spooled": 0, "replayed": 0, "spool_dropped": 0}
+
+
+def spool_dir() -> str:
+    path = os.environ.get("KAFKA_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "mini-sentry-kafka-spool")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enabled() -> bool:
+    return os.environ.get("KAFKA_SPOOL_ENABLED", "1") == "1"
+
+
+def _segments() -> List[str]:
+    d = spool_dir()
+    return sorted(os.path.join(d, n) for n in os.listdir(d) if n.startswith("seg-"))
+
+
+def _size() -> int:
+    total = 0
+    for path in _segments():
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def _roll_locked():
+    global _active
+    if _active is not None:
+        _active[1].close()
+        _active = None
+
+
+def _open_segment():
+    """Create a new active segment, locked before it becomes visible as ``seg-*``."""
+    d = spool_dir()
+    name = f"{int(time.time() * 1000):013d}-{socket.gethostname()}-{os.getpid()}.log"
+    tmp, path = os.path.join(d, f"tmp-{name}"), os.path.join(d, f"seg-{name}")
+    f = open(tmp, "ab")
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    os.rename(tmp, path)
+    return path, f
+
+
+def append(records: List[Tuple[str, dict]]):
+    """Spool ``(topic, value)`` records; drops them if the spool is full."""
+    global _active, _last_fsync
+    if not records or not enabled():
+        return
+    data = _encode(records)
+    max_bytes = int(os.environ.get("KAFKA_SPOOL_MAX_BYTES", str(512 * 1024 * 1024)))
+    segment_bytes = int(os.environ.get("KAFKA_SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+    fsync = os.environ.get("KAFKA_SPOOL_FSYNC", "interval")
+    with _lock:
+        if _size() + len(data) > max_bytes:
+            _stats["spool_dropped"] += len(records)
+            return
+        if _active is not None and _active[1].tell() >= segment_bytes:
+            _roll_locked()
+        if _active is None:
+            _active = _open_segment()
+        f = _active[1]
+        f.write(data)
+        f.flush()
+        now = time.monotonic()
+        if fsync == "always" or (fsync == "interval" and now - _last_fsync >= 1.0):
+            os.fsync(f.fileno())
+            _last_fsync = now
+        _stats["spooled"] += len(records)
+
+
+def _read_segment(path: str) -> List[Tuple[str, dict]]:
+    out = []
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            (length,) = _HEADER.unpack(header)
+            blob = f.read(length)
+            if len(blob) < length:
+                # Torn write from a crash: the rest of the segment is unusable
+                break
+            try:
+                rec = json.loads(blob)
+                out.append((rec["topic"], rec["value"]))
+            except Exception:
+                continue
+    return out
+
+
+def _claim(path: str):
+    """Lock a sealed segment for replay; None while a writer or another
+    replayer holds it, or once it has been replayed and removed."""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    if os.fstat(f.fileno()).st_nlink == 0:
+        # Replayed by the previous holder
+        f.close()
+        return None
+    return f
+
+
+def _encode(records: List[Tuple[str, dict]]) -> bytes:
+    return b"".join(
+        _HEADER.pack(len(blob)) + blob
+        for blob in (json.dumps({"topic": t, "value": v}).encode("utf-8") for t, v in records)
+    )
+
+
+def _keep_tail(path: str, records: List[Tuple[str, dict]]):
+    """Replace a claimed segment with the records the producer never took."""
+    if not records:
+        os.remove(path)
+        return
+    tmp = os.path.join(os.path.dirname(path), "tmp-" + os.path.basename(path))
+    with open(tmp, "wb") as f:
+        f.write(_encode(records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, path)
+
+
+def replay_once(send: Callable[[str, dict], None], flush: Callable[[], None], batch_size: int = 1000) -> int:
+    """Resend every replayable segment; returns the number of records resent.
+
+    Records go out ``batch_size`` at a time with a ``flush`` in between, so a
+    large segment never outgrows the producer backlog. Records handed to the
+    producer either arrive or are spooled again by its error callback; a
+    segment is removed once all of its records were handed over, and if
+    ``send`` or ``flush`` fails only the untaken tail stays on disk.
+    """
+    with _lock:
+        # Seal our own active segment so its records can go out too
+        _roll_locked()
+    replayed = 0
+    for path in _segments():
+        f = _claim(path)
+        if f is None:
+            continue
+        sent = 0
+        try:
+            records = _read_segment(path)
+            try:
+                while sent < len(records):
+                    for topic, value in records[sent:sent + batch_size]:
+                        send(topic, value)
+                        sent += 1
+                    flush()
+            except Exception:
+                _keep_tail(path, records[sent:])
+                raise
+            os.remove(path)
+        finally:
+            f.close()
+            replayed += sent
+            with _lock:
+                _stats["replayed"] += sent
+    return replayed
+
+
+def start_replayer(
+    send: Callable[[str, dict], None],
+    flush: Callable[[], None],
+    connected: Callable[[], bool],
+    batch_size: int = 1000,
+):
+    """Start the background replay thread once per process."""
+    global _replayer
+    if _replayer is not None or not enabled():
+        return
+    interval = float(os.environ.get("KAFKA_SPOOL_REPLAY_SECONDS", "5"))
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                if _segments() and connected():
+                    replay_once(send, flush, batch_size)
+            except Exception as e:
+                print(f"Kafka spool replay error: {e}")
+
+    with _lock:
+        if _replayer is None:
+            _replayer = threading.Thread(target=run, name="kafka-spool-replayer", daemon=True)
+            _replayer.start()
+
+
+def spool_stats() -> Dict[str, float]:
+    segments = _segments() if enabled() else []
+    oldest_age = 0.0
+    if segments:
+        created_ms = int(os.path.basename(segments[0]).split("-")[1])
+        oldest_age = max(0.0, time.time() - created_ms / 1000.0)
+    with _lock:
+        stats = dict(_stats)
+    stats.update(segments=len(segments), bytes=_size() if segments else 0, oldest_age_seconds=round(oldest_age, 3))
+    return stats
@@ -0,0 +1,87 @@
+import random
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+
+
+# Fields a live-stream subscriber can filter on; each accepts one value or a list
+FILTER_FIELDS = ("level", "environment", "release", "fingerprint")
+MAX_FILTER_VALUES = 100
+
+
+class StreamFilter(NamedTuple):
+    """Server-side filter for one WebSocket subscriber. Omitted fields match
+    all; an empty list matches nothing."""
+    level: Optional[FrozenSet[str]] = None
+    environment: Optional[FrozenSet[str]] = None
+    release: Optional[FrozenSet[str]] = None
+    fingerprint: Optional[FrozenSet[str]] = None
+    sample_rate: float = 1.0
+
+    @property
+    def is_empty(self) -> bool:
+        return self == MATCH_ALL
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        for field in FILTER_FIELDS:
+            allowed = getattr(self, field)
+            if allowed is None:
+                continue
+            value = event.get(field)
+            if value is None or str(value) not in allowed:
+                return False
+        return True
+
+    def apply(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.is_empty:
+            return events
+        kept = [e for e in events if self.matches(e)]
+        if self.sample_rate < 1.0:
+            kept = [e for e in kept if random.random() < self.sample_rate]
+        return kept
+
+    def apply_summary(self, summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Narrow a storm summary to the subscribed levels (other fields are
+        not broken down in summaries, so those counts stay upper bounds)."""
+        if self.level is None:
+            return summary
+        levels = {k: v for k, v in summary.get("levels", {}).items() if k in self.level}
+        if not levels:
+            return None
+        return dict(summary, count=sum(levels.values()), levels=levels)
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {f: sorted(getattr(self, f)) for f in FILTER_FIELDS if getattr(self, f) is not None}
+        data["sample_rate"] = self.sample_rate
+        return data
+
+
+MATCH_ALL = StreamFilter()
+
+
+def _values(field: str, value) -> Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    if isinstance(value, (str, int)) and not isinstance(value, bool):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, (str, int)) and not isinstance(v, bool) for v in value):
+        raise ValueError(f"{field} must be a string or a list of strings")
+    if len(value) > MAX_FILTER_VALUES:
+        raise ValueError(f"{field} accepts at most {MAX_FILTER_VALUES} values")
+    return frozenset(str(v) for v in value)
+
+
+def parse_filters(data) -> StreamFilter:
+    """Build a StreamFilter from a subscribe message's ``filters`` object."""
+    if data is None:
+        return MATCH_ALL
+    if not isinstance(data, dict):
+        raise ValueError("filters must be an object")
+    unknown = set(data) - set(FILTER_FIELDS) - {"sample_rate"}
+    if unknown:
+        raise ValueError(f"unknown filter fields: {', '.join(sorted(unknown))}")
+    sample_rate = data.get("sample_rate", 1.0)
+    if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float)) or not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate must be a number in (0, 1]")
+    return StreamFilter(
+        **{field: _values(field, data.get(field)) for field in FILTER_FIELDS},
+        sample_rate=float(sample_rate),
+    )
@@ -0,0 +1,142 @@
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+
+# Per-connection send queue for the live event stream. Channel-layer handlers
+# only enqueue, so a slow browser tab never backs up the layer; a writer task
+# per connection drains the queue at WS_CONNECTION_MAX_MESSAGES_PER_SECOND,
+# merging queued batches into one frame. At WS_CONNECTION_QUEUE_DEPTH the
+# overflow policy (WS_OVERFLOW_POLICY) either drops the oldest frame
+# ("drop_oldest") or folds the whole backlog into one summary ("summarize"), and the client is told how far behind it is with "lag" frames.
+# A lag frame is sent when the oldest queued frame is older than this
+LAG_REPORT_MS = 1000
+
+_lock = threading.Lock()
+STAT_KEYS = (
+    "frames_sent", "events_sent", "coalesced_frames", "dropped_frames", "dropped_events",
+    "summarized_frames", "summarized_events", "lag_frames",
+)
+_stats = Counter()
+_queues = weakref.WeakSet()
+
+
+def _count(**deltas) -> None:
+    with _lock:
+        _stats.update(deltas)
+
+
+def _levels(entry) -> Counter:
+    kind, payload = entry[1], entry[2]
+    if kind == "summary":
+        return Counter(payload["levels"])
+    return Counter(e.get("level") or "error" for e in payload)
+
+
+class SendQueue:
+    def __init__(self, depth: int | None = None, policy: str | None = None):
+        self.depth = max(1, depth or settings.WS_CONNECTION_QUEUE_DEPTH)
+        self.policy = policy or settings.WS_OVERFLOW_POLICY
+        # (enqueued_at, "events" | "summary", frames or summary)
+        self.entries = deque()
+        self.dropped = Counter()
+        self.overflowed = False
+        self.lagging = False
+        self.last_lag_report = 0.0
+        with _lock:
+            _queues.add(self)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lag_ms(self, now: float) -> int:
+        return int((now - self.entries[0][0]) * 1000) if self.entries else 0
+
+    def push_events(self, frames: List[Dict[str, Any]], now: float) -> None:
+        self._push((now, "events", frames))
+
+    def push_summary(self, summary: Dict[str, Any], now: float) -> None:
+        self._push((now, "summary", summary))
+
+    def _push(self, entry) -> None:
+        if len(self.entries) >= self.depth:
+            self.overflowed = True
+            if self.policy == "summarize":
+                self._summarize_backlog()
+            else:
+                dropped = _levels(self.entries.popleft())
+                self.dropped.update(dropped)
+                _count(dropped_events=sum(dropped.values()), dropped_frames=1)
+        self.entries.append(entry)
+
+    def _summarize_backlog(self) -> None:
+        levels, since = Counter(), self.entries[0][0]
+        frames = events = 0
+        while self.entries:
+            entry = self.entries.popleft()
+            levels.update(_levels(entry))
+            if entry[1] == "events":
+                frames, events = frames + 1, events + len(entry[2])
+        self.entries.append((since, "summary", {"count": sum(levels.values()), "levels": dict(levels)}))
+        _count(summarized_events=events, summarized_frames=frames)
+
+    def pop_frames(self, now: float, max_events: int) -> List[Dict[str, Any]]:
+        """Frames for one send slot: an optional lag report, then the oldest
+        queued entry merged with the same-kind entries behind it."""
+        frames = []
+        lag = self.lag_ms(now)
+        if self.overflowed or (lag >= LAG_REPORT_MS and now - self.last_lag_report >= LAG_REPORT_MS / 1000):
+            frames.append({
+                "type": "lag",
+                "lag_ms": lag,
+                "queued": len(self.entries),
+                "dropped": sum(self.dropped.values()),
+                "dropped_levels": dict(self.dropped),
+            })
+            self.dropped.clear()
+            self.overflowed = False
+            self.lagging, self.last_lag_report = True, now
+            _count(lag_frames=1)
+        if not self.entries:
+            return frames
+        _, kind, payload = self.entries.popleft()
+        merged = 0
+        if kind == "events":
+            events = list(payload)
+            while self.entries and self.entries[0][1] == "events" and len(events) + len(self.entries[0][2]) <= max_events:
+                events.extend(self.entries.popleft()[2])
+                merged += 1
+            frames.append({"type": "events", "events": events})
+            _count(events_sent=len(events))
+        else:
+            levels = Counter(payload["levels"])
+            while self.entries and self.entries[0][1] == "summary":
+                levels.update(self.entries.popleft()[2]["levels"])
+                merged += 1
+            frames.append(dict(payload, type="summary", count=sum(levels.values()), levels=dict(levels)))
+        _count(frames_sent=1, coalesced_frames=merged)
+        if not self.entries and self.lagging:
+            # Caught up: let the client clear its lag indicator
+            frames.append({"type": "lag", "lag_ms": 0, "queued": 0, "dropped": 0, "dropped_levels": {}})
+            self.lagging = False
+        return frames
+
+
+def stream_stats() -> Dict[str, Any]:
+    now = time.monotonic()
+    with _lock:
+        queues = list(_queues)
+        stats = {key: _stats[key] for key in STAT_KEYS}
+    return {
+        **stats,
+        "connections": len(queues),
+        "queued_frames": sum(len(q) for q in queues),
+        "max_lag_ms": max((q.lag_ms(now) for q in queues), default=0),
+        "queue_depth": settings.WS_CONNECTION_QUEUE_DEPTH,
+        "overflow_policy": settings.WS_OVERFLOW_POLICY,
+        "max_messages_per_second": settings.WS_CONNECTION_MAX_MESSAGES_PER_SECOND,
+    }
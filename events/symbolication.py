@@ -39,7 +39,8 @@ def _best_sourcemap_for_file(release: Release, file_path: str) -> SourceMap | No
 
 def parse_stacktrace(stack: str) -> List[Dict[str, Any]]:
     """Parse JS stack trace lines into frames.
-    Supports Chrome/Edge/Safari/Firefox formats and a few common variants.
+    Supports Chrome/Edge/Safari/Firefox formats and a few common variants,
+    plus Python traceback ``File "...", line N, in fn`` lines.
     """
     frames: List[Dict[str, Any]] = []
     if not stack:
@@ -54,12 +55,14 @@ def parse_stacktrace(stack: str) -> List[Dict[str, Any]]:
     firefox = re.compile(r"^(?P<fn>[^@]+)?@(?P<file>.*?):(?P<line>\d+):(?P<col>\d+)$")
     # Bare file line:          http://host/file.js:10:120
     bare = re.compile(r"^(?P<file>.*?):(?P<line>\d+):(?P<col>\d+)$")
+    # Python traceback:        File "/app/views.py", line 10, in fn
+    python = re.compile(r'^File "(?P<file>[^"]+)", line (?P<line>\d+)(?:, in (?P<fn>.+))?$')
 
     for line in (stack.splitlines()):
         line = line.strip()
         if not line:
             continue
-        m = chrome_fn.match(line) or chrome_no_fn.match(line) or firefox.match(line) or bare.match(line)
+        m = chrome_fn.match(line) or chrome_no_fn.match(line) or firefox.match(line) or bare.match(line) or python.match(line)
         if not m:
             continue
         gd = m.groupdict()
@@ -5,6 +5,7 @@ from celery import shared_task
 from django.conf import settings
 from .models import Event, Group
 from .alerts import evaluate_alerts_for_event
+from .throttle import throttle_enabled
 
 
 @shared_task
@@ -18,18 +19,54 @@ def process_event(event_id: int):
     return {"event_id": event_id, "status": "processed"}
 
 
+@shared_task
+def process_event_batch(event_ids: list[int], group_ids: list[int] | None = None):
+    # Alert rules look at the group's windowed count, so the newest event of
+    # each group is enough to evaluate a whole envelope. ``group_ids`` are groups
+    # whose events in the batch were all throttled (not stored).
+    latest = {}
+    events = Event.objects.select_related("group", "project").filter(id__in=event_ids).order_by("id")
+    for event in events:
+        latest[event.group_id] = event
+    for group_id in group_ids or []:
+        if group_id not in latest:
+            event = Event.objects.select_related("group", "project").filter(group_id=group_id).order_by("-id").first()
+            if event is not None:
+                latest[group_id] = event
+    for event in latest.values():
+        evaluate_alerts_for_event(event)
+    return {"event_ids": len(event_ids), "groups": len(latest), "status": "processed"}
+
+
+@shared_task
+def flush_group_counters():
+    from .counters import flush
+    return {"groups": flush()}
+
+
+@shared_task
+def index_group_similarity():
+    from .similarity import index_pending, similarity_enabled
+    if not similarity_enabled():
+        return {"status": "disabled"}
+    return index_pending()
+
+
 @shared_task
 def cleanup_old_events():
     days = int(os.environ.get("RETENTION_DAYS", "30"))
     before = timezone.now() - timedelta(days=days)
     # Delete old events
     deleted, _ = Event.objects.filter(received_at__lt=before).delete()
-    # Recalculate group counts and drop empties
-    for grp in Group.objects.all():
+    # Recalculate group counts and drop empties. Throttled or sampled groups
+    # count events that were never stored, so their counts are left alone.
+    recount = not (throttle_enabled() or settings.SPIKE_PROTECTION)
+    # Merged groups hold no events but keep redirecting their fingerprint
+    for grp in Group.objects.filter(merged_into__isnull=True):
         c = grp.events.count()
         if c == 0:
             grp.delete()
-        else:
+        elif recount:
             if grp.count != c:
                 grp.count = c
                 grp.save(update_fields=["count"]) 
@@ -0,0 +1,76 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .ratelimit import get_redis
+
+
+# Per-group storage throttling: every event is counted in a Redis counter per
+# (project, fingerprint, time bucket), but only the first GROUP_STORE_MAX_EVENTS
+# of a bucket (plus every GROUP_STORE_SAMPLE_EVERY-th after that) are stored as
+# full Event rows. The counters double as exact windowed counts for alerting,
+# so sampled events add 1 / sample_rate there; store positions come from a
+# second, unweighted counter of the events that actually arrived.
+KEY_PREFIX = "groupstore"
+# Counters outlive their bucket so alert windows can look back over them
+COUNTER_TTL = 24 * 3600
+
+
+def throttle_enabled() -> bool:
+    return settings.GROUP_STORE_MAX_EVENTS > 0
+
+
+def _bucket(ts: datetime) -> int:
+    return int(ts.timestamp()) // settings.GROUP_STORE_BUCKET_SECONDS
+
+
+def _key(project_id: int, fingerprint: str, bucket: int) -> str:
+    return f"{KEY_PREFIX}:{project_id}:{fingerprint}:{bucket}"
+
+
+def _position_key(project_id: int, fingerprint: str, bucket: int) -> str:
+    return f"{KEY_PREFIX}:pos:{project_id}:{fingerprint}:{bucket}"
+
+
+def _should_store(position: int) -> bool:
+    every = settings.GROUP_STORE_SAMPLE_EVERY
+    return position <= settings.GROUP_STORE_MAX_EVENTS or (every > 0 and position % every == 0)
+
+
+def plan_storage(project_id: int, groups: Dict[str, Tuple[int, int, datetime]]) -> Dict[str, List[bool]]:
+    """Decide which events of a batch get a full Event row.
+
+    ``groups`` maps fingerprint -> (events in the batch, events they count for,
+    bucket timestamp). Returns fingerprint -> one store flag per event, in
+    batch order. One pipelined round trip; everything is stored if Redis fails.
+    """
+    if not throttle_enabled() or not groups:
+        return {fp: [True] * n for fp, (n, _, _) in groups.items()}
+    items = sorted(groups.items())
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for fp, (n, times, seen_at) in items:
+            key = _key(project_id, fp, _bucket(seen_at))
+            pipe.incrby(key, times)
+            pipe.expire(key, COUNTER_TTL)
+            position_key = _position_key(project_id, fp, _bucket(seen_at))
+            pipe.incrby(position_key, n)
+            pipe.expire(position_key, 2 * settings.GROUP_STORE_BUCKET_SECONDS)
+        replies = pipe.execute()
+    except Exception as e:
+        print(f"Group storage throttle unavailable: {e}")
+        return {fp: [True] * n for fp, (n, _, _) in groups.items()}
+    plan = {}
+    for (fp, (n, _, _)), arrived in zip(items, replies[2::4]):
+        before = int(arrived) - n
+        plan[fp] = [_should_store(before + i + 1) for i in range(n)]
+    return plan
+
+
+def windowed_count(project_id: int, fingerprints: Iterable[str], since: datetime) -> int:
+    """Events counted for the given fingerprints since ``since`` (bucket granularity)."""
+    first, last = _bucket(since), _bucket(timezone.now())
+    keys = [_key(project_id, fp, b) for fp in fingerprints for b in range(first, last + 1)]
+    return sum(int(v) for v in get_redis().mget(keys) if v)
@@ -1,8 +1,9 @@
 from rest_framework.routers import DefaultRouter
+from django.conf import settings
 from django.urls import path, include
 from django.http import JsonResponse
 
-from .views import ProjectViewSet, EventViewSet, GroupViewSet, ReleaseViewSet, SymbolicateView, AlertRuleViewSet, SessionIngestView, ReleaseHealthView, ReleaseHealthSeriesView, DeploymentViewSet, EventSeriesView, TopGroupsView
+from .views import ProjectViewSet, EventViewSet, GroupViewSet, ReleaseViewSet, SymbolicateView, AlertRuleViewSet, FingerprintRuleViewSet, SessionIngestView, ReleaseHealthView, ReleaseHealthSeriesView, DeploymentViewSet, EventSeriesView, TopGroupsView, MetricsView, TokenIngestView, AsyncTokenIngestView, AsyncEnvelopeIngestView
 
 router = DefaultRouter()
 router.register(r"projects", ProjectViewSet, basename="project")
@@ -10,11 +11,24 @@ router.register(r"events", EventViewSet, basename="event")
 router.register(r"groups", GroupViewSet, basename="group")
 router.register(r"releases", ReleaseViewSet, basename="release")
 router.register(r"alert-rules", AlertRuleViewSet, basename="alertrule")
+router.register(r"fingerprint-rules", FingerprintRuleViewSet, basename="fingerprintrule")
 router.register(r"deployments", DeploymentViewSet, basename="deployment")
 
+if settings.INGEST_ASYNC:
+    # Native async ingest; registered ahead of the router's event routes
+    ingest_urls = [
+        path("events/ingest/token/<str:token>/", AsyncTokenIngestView.as_view()),
+        path("events/envelope/token/<str:token>/", AsyncEnvelopeIngestView.as_view()),
+    ]
+else:
+    # Lean ingest path; registered ahead of the router's event routes
+    ingest_urls = [path("events/ingest/token/<str:token>/", TokenIngestView.as_view())]
+
 urlpatterns = [
+    *ingest_urls,
     path("", include(router.urls)),
     path("health/", lambda r: JsonResponse({"ok": True})),
+    path("metrics/", MetricsView.as_view()),
     path("symbolicate/", SymbolicateView.as_view()),
     path("sessions/ingest/token/<str:token>/", SessionIngestView.as_view()),
     path("releases/health/", ReleaseHealthView.as_view()),
@@ -5,12 +5,19 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+import orjson
+from asgiref.sync import sync_to_async
 
-from django.db.models import F
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 
-from .models import Event, Project, Group, Release, AlertRule, AlertTarget, Session, ReleaseDeployment, Comment
+from .models import Event, Project, Group, Release, AlertRule, AlertTarget, Session, ReleaseDeployment, Comment, FingerprintRule, GroupMergeSuggestion
 from .serializers import (
     EventSerializer,
     ProjectSerializer,
@@ -22,20 +29,58 @@ from .serializers import (
     SessionSerializer,
     ReleaseDeploymentSerializer,
     CommentSerializer,
+    FingerprintRuleSerializer,
+    GroupMergeSuggestionSerializer,
 )
 from django.conf import settings
-from .tasks import process_event
-from .grouping import compute_fingerprint
-from .ratelimit import check_rate_limit
-from .kafka import publish_event
+from .sampling import aadmit, admit, current_sample_rate, sample, spike_protection_enabled
+from .kafka import producer_stats
+from .spool import spool_stats
+from .fanout import fanout_stats
+from .stream_queue import stream_stats
 from .ch import query_events, query_session_series, query_events_series_by_level, query_top_groups
 from .symbolication import symbolicate_frames_for_release
+from .counters import merge_pending
+from .projects import aget_project_by_token, get_project_by_token, project_by_slug_or_404, project_by_token_or_404
+from .releases import forget_release_ids, resolve_release_id
+from .similarity import merge_groups, similar_groups
+from .ingest_queue import aenqueue_events, enqueue_events, queue_enabled
+from .dedup import aclaim as aclaim_event_ids, claim as claim_event_ids, release as release_event_ids
+from .ingest import EnvelopeError, parse_envelope, ingest_batch, dispatch_batch, adispatch_batch
 
 
 class ProjectViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = Project.objects.all().order_by("-id")
     serializer_class = ProjectSerializer
 
+    @action(detail=True, methods=["get"], url_path="sampling")  # /projects/{id}/sampling/
+    def sampling(self, request, pk=None):
+        """Spike-protection state: the sample rate in effect and, over the last
+        hour, stored events vs the events they stand for."""
+        project = self.get_object()
+        since = timezone.now() - timezone.timedelta(hours=1)
+        stats = Event.objects.filter(project=project, received_at__gte=since).aggregate(
+            stored=Count("id"),
+            sampled=Count("id", filter=Q(sample_rate__lt=1.0)),
+            avg_sample_rate=Avg("sample_rate"),
+            estimated=Sum(ExpressionWrapper(Value(1.0) / F("sample_rate"), output_field=FloatField())),
+        )
+        try:
+            rate = current_sample_rate(project.id)
+        except Exception:
+            rate = None
+        return Response({
+            "project": project.slug,
+            "spike_protection": spike_protection_enabled(),
+            "current_sample_rate": rate,
+            "last_hour": {
+                "stored_events": stats["stored"],
+                "sampled_events": stats["sampled"],
+                "avg_sample_rate": stats["avg_sample_rate"],
+                "estimated_events": round(stats["estimated"] or 0),
+            },
+        })
+
 
 class EventViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     queryset = Event.objects.all().order_by("-received_at")
@@ -110,145 +155,37 @@ class EventViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retrie
                 qs = qs.filter(qobj)
         return qs
 
-    def _normalize_level(self, payload: dict) -> str:
-        """Derive a normalized level from common fields.
-        Priority: payload.level -> payload.severity/severity_text -> payload.extra.level -> payload.extra.severity -> severity_number -> 'error'
-        Maps warn/warning to 'warning'; debug/trace -> 'info'; fatal -> 'error'.
-        """
-        def map_text(v: str | None) -> str | None:
-            if not v:
-                return None
-            t = str(v).strip().lower()
-            if t in {"warn", "warning"}:
-                return "warning"
-            if t in {"err", "error", "fatal"}:
-                return "error"
-            if t in {"info", "log", "notice", "debug", "trace"}:
-                return "info"
-            return t
-
-        level = (
-            map_text(payload.get("level"))
-            or map_text(payload.get("severity"))
-            or map_text(payload.get("severity_text"))
-            or map_text((payload.get("extra") or {}).get("level"))
-            or map_text((payload.get("extra") or {}).get("severity"))
-        )
-        if not level:
-            try:
-                sev_num = int(payload.get("severity_number")) if payload.get("severity_number") is not None else None
-            except Exception:
-                sev_num = None
-            if sev_num is not None:
-                # OpenTelemetry: 1-4 trace, 5-8 debug, 9-12 info, 13-16 warn, 17-20 error, 21-24 fatal
-                if 13 <= sev_num <= 16:
-                    level = "warning"
-                elif 17 <= sev_num <= 24:
-                    level = "error"
-                else:
-                    level = "info"
-        return level or "error"
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Ingest actions record their quota decision for X-RateLimit-*/Retry-After
+        result = getattr(self, "rate_limit_result", None)
+        if result is not None:
+            for header, value in result.headers().items():
+                response[header] = value
+        return response
 
     @action(detail=False, methods=["post"], url_path="ingest/(?P<project_slug>[^/.]+)")
     def ingest(self, request, project_slug=None):
-        project = get_object_or_404(Project, slug=project_slug)
+        project = project_by_slug_or_404(project_slug)
         # Rate limit by project slug
-        allowed, remaining = check_rate_limit(f"project:{project.slug}", settings.RATE_LIMIT_EVENTS_PER_MINUTE)
-        if not allowed:
+        self.rate_limit_result, sample_rate = admit(project, f"project:{project.slug}", settings.RATE_LIMIT_EVENTS_PER_MINUTE)
+        if sample_rate is None:
             return Response({"detail": "Rate limit exceeded"}, status=status.HTTP_429_TOO_MANY_REQUESTS)
         payload = request.data or {}
-        message = payload.get("message", "")
-        level = self._normalize_level(payload)
-        release = self._get_or_create_release(project, payload)
-        env = payload.get("environment", "production")
-        stack = payload.get("stack")
-        frames = payload.get("frames")
-        group = self._get_or_create_group(project, message, level)
-        event = Event.objects.create(
-            project=project,
-            group=group,
-            message=message,
-            level=level,
-            payload=payload,
-            release=release,
-            environment=env,
-            stack=stack,
-            tags=payload.get("tags", []),
-        )
-        # Inline symbolication (best-effort)
-        try:
-            if release and (frames or stack):
-                sym = symbolicate_frames_for_release(release, frames, stack)
-                event.symbolicated = {"frames": sym}
-                event.save(update_fields=["symbolicated"])
-        except Exception as e:
-            print(f"Kafka publish error: {e}")
-            import traceback
-            traceback.print_exc()
-        # Kick off async processing (stub)
+        _, duplicates = claim_event_ids(project.id, [payload])
+        if duplicates:
+            return Response(dict(duplicates[0], duplicate=True), status=status.HTTP_200_OK)
+        if not sample([payload], sample_rate):
+            return Response({"sampled": False, "sample_rate": sample_rate}, status=status.HTTP_200_OK)
+        if queue_enabled():
+            return self._accept_queued(project, [payload], sample_rate)
         try:
-            process_event.delay(event.id)
+            events = ingest_batch(project, [payload], sample_rates=[sample_rate])
         except Exception:
-            # If Celery broker is not ready, we still ingest synchronously
-            from .alerts import evaluate_alerts_for_event
-            try:
-                evaluate_alerts_for_event(event)
-            except Exception:
-                pass
-        # Publish to Kafka for ClickHouse pipeline
-        try:
-            publish_event(
-                {
-                    "id": event.id,
-                    "event_id": event.id,
-                    "project": project.slug,
-                    "message": message,
-                    "level": level,
-                    "environment": env,
-                    "fingerprint": group.fingerprint if group else None,
-                    "title": group.title if group else None,
-                    "received_at": event.received_at.isoformat(),
-                }
-            )
-        except Exception as e:
-            print(f"Kafka publish error: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # Publish to WebSocket channels for real-time updates
-        try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            import time
-            
-            channel_layer = get_channel_layer()
-            print(f"📡 [WebSocket] Channel layer available: {channel_layer is not None}")
-            
-            if channel_layer:
-                event_data = {
-                    "type": "new_event",
-                    "event_id": event.id,
-                    "project": project.slug,
-                    "message": message,
-                    "level": level,
-                    "environment": env,
-                    "fingerprint": group.fingerprint if group else None,
-                    "timestamp": int(time.time() * 1000),
-                }
-                print(f"📡 [WebSocket] Publishing event to group 'events_{project.slug}': {event_data}")
-                
-                async_to_sync(channel_layer.group_send)(
-                    f"events_{project.slug}",
-                    event_data
-                )
-                print(f"✅ [WebSocket] Event published successfully")
-            else:
-                print("❌ [WebSocket] No channel layer available")
-        except Exception as e:
-            print(f"❌ [WebSocket] Publish error: {e}")
-            import traceback
-            traceback.print_exc()
-        return Response(EventSerializer(event).data, status=status.HTTP_201_CREATED)
+            release_event_ids(project.id, [payload])
+            raise
+        dispatch_batch(project, events)
+        return Response(*_ingested_event_response(events[0]))
 
     @action(detail=False, methods=["get"], url_path="clickhouse")
     def clickhouse_events(self, request):
@@ -275,140 +212,238 @@ class EventViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retrie
         ]
         return Response(data)
 
-    @action(detail=False, methods=["post"], url_path="ingest/token/(?P<token>[^/.]+)")
-    def ingest_with_token(self, request, token=None):
-        project = get_object_or_404(Project, ingest_token=token)
-        # Rate limit by token
-        allowed, remaining = check_rate_limit(f"token:{project.ingest_token}", settings.RATE_LIMIT_EVENTS_PER_MINUTE)
-        if not allowed:
-            return Response({"detail": "Rate limit exceeded"}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-        payload = request.data or {}
-        message = payload.get("message", "")
-        level = self._normalize_level(payload)
-        release = self._get_or_create_release(project, payload)
-        env = payload.get("environment", "production")
-        stack = payload.get("stack")
-        frames = payload.get("frames")
-        group = self._get_or_create_group(project, message, level)
-        event = Event.objects.create(
-            project=project,
-            group=group,
-            message=message,
-            level=level,
-            payload=payload,
-            release=release,
-            environment=env,
-            stack=stack,
-            tags=payload.get("tags", []),
-        )
+    @action(detail=False, methods=["post"], url_path="envelope/token/(?P<token>[^/.]+)")
+    def envelope(self, request, token=None):
+        """Ingest many events in one request (JSON array, {"events": [...]} or NDJSON)."""
+        project = project_by_token_or_404(token)
         try:
-            if release and (frames or stack):
-                sym = symbolicate_frames_for_release(release, frames, stack)
-                event.symbolicated = {"frames": sym}
-                event.save(update_fields=["symbolicated"])
-        except Exception as e:
-            print(f"Kafka publish error: {e}")
-            import traceback
-            traceback.print_exc()
+            payloads = parse_envelope(request.body)
+        except EnvelopeError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not payloads:
+            return Response({"detail": "envelope is empty"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(payloads) > settings.ENVELOPE_MAX_EVENTS:
+            return Response(
+                {"detail": f"envelope exceeds {settings.ENVELOPE_MAX_EVENTS} events"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        # Shares the per-token quota with single-event ingest
+        self.rate_limit_result, sample_rate = admit(
+            project, f"token:{project.ingest_token}", settings.RATE_LIMIT_EVENTS_PER_MINUTE, cost=len(payloads)
+        )
+        if sample_rate is None:
+            return Response({"detail": "Rate limit exceeded"}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        payloads, duplicates = claim_event_ids(project.id, payloads)
+        payloads = sample(payloads, sample_rate)
+        extra = {"duplicates": duplicates, "sample_rate": sample_rate}
+        if not payloads:
+            return Response({"count": 0, "ids": [], **extra}, status=status.HTTP_200_OK)
+        if queue_enabled():
+            response = self._accept_queued(project, payloads, sample_rate)
+            response.data.update(extra)
+            return response
         try:
-            process_event.delay(event.id)
+            events = ingest_batch(project, payloads, sample_rates=[sample_rate] * len(payloads))
         except Exception:
-            from .alerts import evaluate_alerts_for_event
-            try:
-                evaluate_alerts_for_event(event)
-            except Exception:
-                pass
+            release_event_ids(project.id, payloads)
+            raise
+        dispatch_batch(project, events)
+        ids = [e.id for e in events if e.id is not None]
+        return Response(
+            {"count": len(events), "ids": ids, "throttled": len(events) - len(ids), **extra},
+            status=status.HTTP_201_CREATED,
+        )
+
+    def _accept_queued(self, project: Project, payloads: list, sample_rate: float = 1.0):
+        """Fast path for INGEST_MODE=queue: persist the raw payloads and answer 202."""
         try:
-            publish_event(
-                {
-                    "id": event.id,
-                    "event_id": event.id,
-                    "project": project.slug,
-                    "message": message,
-                    "level": level,
-                    "environment": env,
-                    "fingerprint": group.fingerprint if group else None,
-                    "title": group.title if group else None,
-                    "received_at": event.received_at.isoformat(),
-                }
-            )
+            enqueue_events(project.id, payloads, sample_rate)
         except Exception as e:
-            print(f"Kafka publish error: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # Publish to WebSocket channels for real-time updates
+            print(f"Ingest queue error: {e}")
+            release_event_ids(project.id, payloads)
+            return Response({"detail": "Ingest queue unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"queued": len(payloads)}, status=status.HTTP_202_ACCEPTED)
+
+
+def _ingested_event_response(event: Event):
+    """Body and status for single-event ingest: the stored event, or a short
+    receipt when per-group storage throttling counted it without storing it."""
+    if event.id is None:
+        return {"id": None, "group": event.group_id, "stored": False}, status.HTTP_200_OK
+    return EventSerializer(event).data, status.HTTP_201_CREATED
+
+
+def _json_response(data, status_code: int) -> HttpResponse:
+    return HttpResponse(orjson.dumps(data), status=status_code, content_type="application/json")
+
+
+def _parse_single_event(body: bytes):
+    """(payload, None) or (None, 400 response) for a single-event body."""
+    try:
+        payload = orjson.loads(body) if body else {}
+    except orjson.JSONDecodeError as e:
+        return None, _json_response({"detail": f"JSON parse error - {e}"}, 400)
+    if not isinstance(payload, dict):
+        return None, _json_response({"detail": "event payload must be a JSON object"}, 400)
+    return payload, None
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TokenIngestView(View):
+    """Lean single-event ingest (``POST /api/events/ingest/token/{token}/``).
+
+    A plain Django view: the body is parsed once with orjson and the response
+    is rendered directly, skipping DRF's request wrapping, content negotiation
+    and renderer selection on the hottest endpoint. Responses match the other
+    ingest endpoints (201 with the serialized event, 202 when queued, 429 with
+    rate-limit headers).
+    """
+
+    def post(self, request, token: str):
+        project = get_project_by_token(token)
+        if project is None:
+            return _json_response({"detail": "No Project matches the given query."}, 404)
+        result, sample_rate = admit(project, f"token:{project.ingest_token}", settings.RATE_LIMIT_EVENTS_PER_MINUTE)
+        if sample_rate is not None:
+            response = self._ingest(request, project, sample_rate)
+        else:
+            response = _json_response({"detail": "Rate limit exceeded"}, 429)
+        for header, value in result.headers().items():
+            response[header] = value
+        return response
+
+    def _ingest(self, request, project: Project, sample_rate: float) -> HttpResponse:
+        payload, error = _parse_single_event(request.body)
+        if error is not None:
+            return error
+        _, duplicates = claim_event_ids(project.id, [payload])
+        if duplicates:
+            return _json_response(dict(duplicates[0], duplicate=True), 200)
+        if not sample([payload], sample_rate):
+            return _json_response({"sampled": False, "sample_rate": sample_rate}, 200)
+        if queue_enabled():
+            try:
+                enqueue_events(project.id, [payload], sample_rate)
+            except Exception as e:
+                print(f"Ingest queue error: {e}")
+                release_event_ids(project.id, [payload])
+                return _json_response({"detail": "Ingest queue unavailable"}, 503)
+            return _json_response({"queued": 1}, 202)
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            import time
-            
-            channel_layer = get_channel_layer()
-            print(f"📡 [WebSocket] Channel layer available: {channel_layer is not None}")
-            
-            if channel_layer:
-                event_data = {
-                    "type": "new_event",
-                    "event_id": event.id,
-                    "project": project.slug,
-                    "message": message,
-                    "level": level,
-                    "environment": env,
-                    "fingerprint": group.fingerprint if group else None,
-                    "timestamp": int(time.time() * 1000),
-                }
-                print(f"📡 [WebSocket] Publishing event to group 'events_{project.slug}': {event_data}")
-                
-                async_to_sync(channel_layer.group_send)(
-                    f"events_{project.slug}",
-                    event_data
-                )
-                print(f"✅ [WebSocket] Event published successfully")
-            else:
-                print("❌ [WebSocket] No channel layer available")
-        except Exception as e:
-            print(f"❌ [WebSocket] Publish error: {e}")
-            import traceback
-            traceback.print_exc()
-        return Response(EventSerializer(event).data, status=status.HTTP_201_CREATED)
-
-    def _get_or_create_release(self, project: Project, payload: dict):
-        version = (payload or {}).get("release")
-        environment = (payload or {}).get("environment", "production")
-        if not version:
-            return None
-        rel, _ = Release.objects.get_or_create(
-            project=project,
-            version=version,
-            environment=environment,
+            events = ingest_batch(project, [payload], sample_rates=[sample_rate])
+        except Exception:
+            release_event_ids(project.id, [payload])
+            raise
+        dispatch_batch(project, events)
+        return _json_response(*_ingested_event_response(events[0]))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncTokenIngestView(View):
+    """``TokenIngestView`` as a native async view (INGEST_ASYNC=1).
+
+    Under Daphne the request is served on the event loop: project lookup,
+    rate limiting, dedup claims, sampling and the queue XADD use the async ORM
+    and the asyncio Redis client, so a worker thread is only taken for the
+    ORM writes of sync-mode ingest and for alert/Kafka hand-off.
+    """
+
+    async def post(self, request, token: str):
+        project = await aget_project_by_token(token)
+        if project is None:
+            return _json_response({"detail": "No Project matches the given query."}, 404)
+        result, sample_rate = await aadmit(
+            project, f"token:{project.ingest_token}", settings.RATE_LIMIT_EVENTS_PER_MINUTE
         )
-        return rel
-
-    def _get_or_create_group(self, project: Project, message: str, level: str) -> Group:
-        fingerprint, title = compute_fingerprint(message, level)
-        now = timezone.now()
-        group, created = Group.objects.get_or_create(
-            project=project, fingerprint=fingerprint,
-            defaults={"title": title, "level": level, "first_seen": now, "last_seen": now, "count": 1},
+        if sample_rate is not None:
+            response = await self._ingest(request, project, sample_rate)
+        else:
+            response = _json_response({"detail": "Rate limit exceeded"}, 429)
+        for header, value in result.headers().items():
+            response[header] = value
+        return response
+
+    async def _ingest(self, request, project: Project, sample_rate: float) -> HttpResponse:
+        payload, error = _parse_single_event(request.body)
+        if error is not None:
+            return error
+        _, duplicates = await aclaim_event_ids(project.id, [payload])
+        if duplicates:
+            return _json_response(dict(duplicates[0], duplicate=True), 200)
+        if not sample([payload], sample_rate):
+            return _json_response({"sampled": False, "sample_rate": sample_rate}, 200)
+        if queue_enabled():
+            return await _aaccept_queued(project, [payload], sample_rate)
+        events = await _aingest_batch(project, [payload], [sample_rate])
+        response = await sync_to_async(_ingested_event_response)(events[0])
+        return _json_response(*response)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncEnvelopeIngestView(View):
+    """Async counterpart of ``POST /api/events/envelope/token/{token}/``
+    (INGEST_ASYNC=1); same limits, dedup, sampling and response bodies."""
+
+    async def post(self, request, token: str):
+        project = await aget_project_by_token(token)
+        if project is None:
+            return _json_response({"detail": "No Project matches the given query."}, 404)
+        try:
+            payloads = parse_envelope(request.body)
+        except EnvelopeError as e:
+            return _json_response({"detail": str(e)}, 400)
+        if not payloads:
+            return _json_response({"detail": "envelope is empty"}, 400)
+        if len(payloads) > settings.ENVELOPE_MAX_EVENTS:
+            return _json_response({"detail": f"envelope exceeds {settings.ENVELOPE_MAX_EVENTS} events"}, 413)
+        result, sample_rate = await aadmit(
+            project, f"token:{project.ingest_token}", settings.RATE_LIMIT_EVENTS_PER_MINUTE, cost=len(payloads)
         )
-        if not created:
-            # Check if group was resolved - if so, reopen it (Sentry regression logic)
-            updates = {
-                "last_seen": now,
-                "level": level,
-                "count": F("count") + 1,
-            }
-            
-            # Handle status transitions for new events (Sentry-style logic)
-            if group.status == Group.STATUS_RESOLVED:
-                # Resolved issues reopen on new events (regression)
-                updates["status"] = Group.STATUS_UNRESOLVED
-                updates["resolved_at"] = None
-            # Note: Ignored issues stay ignored (they're meant to be muted)
-                
-            Group.objects.filter(id=group.id).update(**updates)
-            group.refresh_from_db(fields=["count", "last_seen", "level", "status", "resolved_at"])
-        return group
+        if sample_rate is not None:
+            response = await self._ingest(project, payloads, sample_rate)
+        else:
+            response = _json_response({"detail": "Rate limit exceeded"}, 429)
+        for header, value in result.headers().items():
+            response[header] = value
+        return response
+
+    async def _ingest(self, project: Project, payloads: list, sample_rate: float) -> HttpResponse:
+        payloads, duplicates = await aclaim_event_ids(project.id, payloads)
+        payloads = sample(payloads, sample_rate)
+        extra = {"duplicates": duplicates, "sample_rate": sample_rate}
+        if not payloads:
+            return _json_response({"count": 0, "ids": [], **extra}, 200)
+        if queue_enabled():
+            response = await _aaccept_queued(project, payloads, sample_rate)
+            if response.status_code == 202:
+                response = _json_response({"queued": len(payloads), **extra}, 202)
+            return response
+        events = await _aingest_batch(project, payloads, [sample_rate] * len(payloads))
+        ids = [e.id for e in events if e.id is not None]
+        return _json_response({"count": len(events), "ids": ids, "throttled": len(events) - len(ids), **extra}, 201)
+
+
+async def _aaccept_queued(project: Project, payloads: list, sample_rate: float) -> HttpResponse:
+    try:
+        await aenqueue_events(project.id, payloads, sample_rate)
+    except Exception as e:
+        print(f"Ingest queue error: {e}")
+        await sync_to_async(release_event_ids, thread_sensitive=False)(project.id, payloads)
+        return _json_response({"detail": "Ingest queue unavailable"}, 503)
+    return _json_response({"queued": len(payloads)}, 202)
+
+
+async def _aingest_batch(project: Project, payloads: list, sample_rates: list):
+    # ingest_batch wraps the group upserts and event insert in one
+    # transaction.atomic() block, which needs a single thread and connection:
+    # it runs in the thread Django's async ORM methods use, not query by query
+    try:
+        events = await sync_to_async(ingest_batch)(project, payloads, sample_rates=sample_rates)
+    except Exception:
+        await sync_to_async(release_event_ids, thread_sensitive=False)(project.id, payloads)
+        raise
+    await adispatch_batch(project, events)
+    return events
 
 
 class GroupViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
@@ -417,6 +452,9 @@ class GroupViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.Ge
 
     def get_queryset(self):
         qs = super().get_queryset()
+        if self.action == "list":
+            # Merged groups only redirect their fingerprint
+            qs = qs.filter(merged_into__isnull=True)
         project = self.request.query_params.get("project")
         if project:
             qs = qs.filter(project__slug=project)
@@ -464,6 +502,19 @@ class GroupViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.Ge
                 qs = qs.filter(qobj)
         return qs
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get("live") == "1":
+            rows = response.data["results"] if isinstance(response.data, dict) else response.data
+            merge_pending(rows)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if request.query_params.get("live") == "1":
+            merge_pending([response.data])
+        return response
+
     @action(detail=True, methods=["post"])  # /groups/{id}/resolve/
     def resolve(self, request, pk=None):
         g = self.get_object()
@@ -509,6 +560,47 @@ class GroupViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.Ge
         g.save(update_fields=["is_bookmarked"])
         return Response({"ok": True})
 
+    @action(detail=True, methods=["get"])  # /groups/{id}/similar/
+    def similar(self, request, pk=None):
+        g = self.get_object()
+        try:
+            threshold = float(request.query_params["threshold"]) if "threshold" in request.query_params else None
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"detail": "threshold and limit must be numbers"}, status=400)
+        return Response([
+            {"group": GroupSerializer(other).data, "similarity": score}
+            for other, score in similar_groups(g, threshold=threshold, limit=limit)
+        ])
+
+    @action(detail=True, methods=["post"])  # /groups/{id}/merge/ {"into": <group id>}
+    def merge(self, request, pk=None):
+        g = self.get_object()
+        try:
+            into = int(request.data.get("into"))
+        except (TypeError, ValueError):
+            return Response({"detail": "into must be a group id"}, status=400)
+        target = get_object_or_404(Group, id=into, project=g.project)
+        try:
+            target = merge_groups(g, target)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response(GroupSerializer(target).data)
+
+    @action(detail=False, methods=["get"], url_path="merge-suggestions")
+    def merge_suggestions(self, request):
+        qs = GroupMergeSuggestion.objects.select_related("group", "similar_group").order_by("-similarity", "-id")
+        project = request.query_params.get("project")
+        if project:
+            qs = qs.filter(project__slug=project)
+        return Response(GroupMergeSuggestionSerializer(qs[:100], many=True).data)
+
+    @action(detail=True, methods=["post"], url_path="dismiss-suggestions")
+    def dismiss_suggestions(self, request, pk=None):
+        g = self.get_object()
+        GroupMergeSuggestion.objects.filter(group=g).delete()
+        return Response({"ok": True})
+
     @action(detail=True, methods=["get", "post"], url_path="comments")
     def comments(self, request, pk=None):
         g = self.get_object()
@@ -647,9 +739,28 @@ class AlertRuleViewSet(
         return Response(AlertRuleSerializer(rules, many=True).data)
 
 
+class FingerprintRuleViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    serializer_class = FingerprintRuleSerializer
+    queryset = FingerprintRule.objects.all().order_by("project_id", "order", "id")
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        project = self.request.query_params.get("project")
+        if project:
+            qs = qs.filter(project__slug=project)
+        return qs
+
+
 class SessionIngestView(APIView):
     def post(self, request, token: str):
-        project = get_object_or_404(Project, ingest_token=token)
+        project = project_by_token_or_404(token)
         payload = request.data or {}
         version = payload.get("release")
         environment = payload.get("environment", "production")
@@ -659,27 +770,16 @@ class SessionIngestView(APIView):
         user = payload.get("user", "")
         if not sess_id:
             return Response({"detail": "session_id required"}, status=400)
-        release = None
-        if version:
-            release, _ = Release.objects.get_or_create(project=project, version=version, environment=environment)
-        obj, created = Session.objects.get_or_create(
-            project=project, session_id=sess_id,
-            defaults={
-                "release": release,
-                "environment": environment,
-                "status": status,
-                "duration_ms": duration_ms,
-                "user": user,
-            }
-        )
-        if not created:
-            obj.release = release or obj.release
-            obj.environment = environment
-            obj.status = status
-            obj.duration_ms = duration_ms or obj.duration_ms
-            obj.user = user or obj.user
-            obj.updated_at = timezone.now()
-            obj.save()
+        release_id = resolve_release_id(project.id, version, environment) if version else None
+        try:
+            obj, created = self._save_session(project, sess_id, release_id, environment, status, duration_ms, user)
+        except IntegrityError:
+            if not version:
+                raise
+            # A release deleted by another worker is still cached here; resolve once more
+            forget_release_ids(project.id, [(version, environment)])
+            release_id = resolve_release_id(project.id, version, environment)
+            obj, created = self._save_session(project, sess_id, release_id, environment, status, duration_ms, user)
         # Publish to Kafka for ClickHouse rollups
         try:
             from .kafka import publish_session
@@ -699,6 +799,30 @@ class SessionIngestView(APIView):
             traceback.print_exc()
         return Response(SessionSerializer(obj).data, status=201 if created else 200)
 
+    @staticmethod
+    def _save_session(project, sess_id, release_id, environment, status, duration_ms, user):
+        # Its own transaction, so the deferred release FK is checked here
+        with transaction.atomic():
+            obj, created = Session.objects.get_or_create(
+                project=project, session_id=sess_id,
+                defaults={
+                    "release_id": release_id,
+                    "environment": environment,
+                    "status": status,
+                    "duration_ms": duration_ms,
+                    "user": user,
+                }
+            )
+            if not created:
+                obj.release_id = release_id or obj.release_id
+                obj.environment = environment
+                obj.status = status
+                obj.duration_ms = duration_ms or obj.duration_ms
+                obj.user = user or obj.user
+                obj.updated_at = timezone.now()
+                obj.save()
+        return obj, created
+
 
 class ReleaseHealthView(APIView):
     def get(self, request):
@@ -928,4 +1052,9 @@ class TopGroupsView(APIView):
         return Response(data)
 
 
+class MetricsView(APIView):
+    def get(self, request):
+        return Response({"kafka": producer_stats(), "kafka_spool": spool_stats(), "ws_fanout": fanout_stats(), "ws_stream": stream_stats()})
+
+
 # SSE implementation removed - replaced with WebSocket + Redis for better reliability
@@ -1,3 +1,5 @@
+import gzip
+import json
 import logging
 import os
 import requests
@@ -21,13 +23,14 @@ class MiniSentryHandler(logging.Handler):
         logging.getLogger().setLevel(logging.INFO)
     """
 
-    def __init__(self, base: str, token: str, release: str = '1.0.0', environment: str = 'development', app: str = 'python-app', level=logging.NOTSET):
+    def __init__(self, base: str, token: str, release: str = '1.0.0', environment: str = 'development', app: str = 'python-app', level=logging.NOTSET, compress: bool = True):
         super().__init__(level)
         self.base = base.rstrip('/')
         self.token = token
         self.release = release
         self.environment = environment
         self.app = app
+        self.compress = compress
 
     def emit(self, record: logging.LogRecord) -> None:
         if not self.token:
@@ -56,7 +59,13 @@ class MiniSentryHandler(logging.Handler):
                 }
             }
             url = f"{self.base}/api/events/ingest/token/{self.token}/"
-            requests.post(url, json=payload, timeout=3)
+            if self.compress:
+                # Stack traces compress well; the server accepts gzip bodies
+                body = gzip.compress(json.dumps(payload).encode('utf-8'))
+                headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+                requests.post(url, data=body, headers=headers, timeout=3)
+            else:
+                requests.post(url, json=payload, timeout=3)
         except Exception:
             # Never raise from logging handler
             pass
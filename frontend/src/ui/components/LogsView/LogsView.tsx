@@ -9,6 +9,7 @@ import { ToggleSwitch } from '../ToggleSwitch'
 import { parseTokens, removeTokenFromQuery } from '../../utils/search.utils'
 import { fmtDate } from '../../utils/date.utils'
 import { useWebSocketEvents } from '../../hooks/useWebSocketEvents'
+import type { EventSummary } from '../../hooks/useWebSocketEvents'
 import { LogsChart } from './LogsChart'
 import { EventsList } from './EventsList'
 import { SearchFilters } from './SearchFilters'
@@ -48,6 +49,8 @@ export const LogsView = ({
   const [legendSel, setLegendSel] = useState({ error: true, warning: true, info: true })
   const [realTimeEnabled, setRealTimeEnabled] = useState(false)
   const [realtimeEvents, setRealtimeEvents] = useState<Event[]>([])
+  // Events the server folded into storm summaries instead of sending one by one
+  const [summarizedCount, setSummarizedCount] = useState(0)
   
   const tokens = parseTokens(search)
   const timeFilteredEvents = timeSel
@@ -60,8 +63,9 @@ export const LogsView = ({
     : events
   const visibleEvents = timeFilteredEvents.filter(e => legendSel[e.level ?? 'error'] !== false)
 
-  // WebSocket real-time events handling
-  const { isConnected, reconnect, disconnect } = useWebSocketEvents({
+  // WebSocket real-time events handling. The legend only hides levels locally:
+  // a server-side level filter would drop events for good while a level is off.
+  const { isConnected, lag, reconnect, disconnect } = useWebSocketEvents({
     projectSlug: selected.slug,
     enabled: realTimeEnabled,
     onNewEvent: useCallback((event) => {
@@ -98,6 +102,9 @@ export const LogsView = ({
         setRealtimeEvents(prev => [formattedEvent, ...prev.slice(0, 99)]) // Keep last 100 real-time events
       }
     }, [selected.slug, onNewRealtimeEvent]),
+    onSummary: useCallback((summary: EventSummary) => {
+      setSummarizedCount(prev => prev + summary.count)
+    }, []),
     onError: useCallback((error: string) => {
       console.error('[LogsView] WebSocket connection error:', error)
       // Don't auto-disable on error - let user control it
@@ -111,6 +118,7 @@ export const LogsView = ({
     const p = projects.find(pp => pp.id === Number(e.target.value))
     if (p) { 
       setSelected(p)
+      setSummarizedCount(0)
       setRange('24h')
       setInterval('1h')
       setTimeSel(null)
@@ -127,6 +135,7 @@ export const LogsView = ({
     if (!enabled) {
       // Clear real-time events when disabling real-time mode
       setRealtimeEvents([])
+      setSummarizedCount(0)
     }
   }, [])
 
@@ -226,6 +235,26 @@ export const LogsView = ({
                 <span>Connecting...</span>
               </div>
             )}
+
+            {realTimeEnabled && isConnected && lag && (
+              <div className="flex items-center gap-1 text-xs text-yellow-400" data-testid="stream-lag">
+                <div className="h-2 w-2 rounded-full bg-yellow-500" />
+                <span>
+                  Behind {Math.round(lag.lag_ms / 1000)}s{lag.dropped > 0 ? `, ${lag.dropped} events skipped` : ''}
+                </span>
+              </div>
+            )}
+
+            {realTimeEnabled && summarizedCount > 0 && (
+              <div
+                className="flex items-center gap-1 text-xs text-yellow-400"
+                data-testid="stream-summarized"
+                title="The stream was truncated during an event storm; these events are counted but not listed"
+              >
+                <div className="h-2 w-2 rounded-full bg-yellow-500" />
+                <span>{summarizedCount} events summarized</span>
+              </div>
+            )}
           </div>
         </div>
 
@@ -4,24 +4,55 @@ interface WebSocketEventsOptions {
   projectSlug: string
   enabled: boolean
   onNewEvent: (event: RealTimeEvent) => void
+  onSummary?: (summary: EventSummary) => void
+  filters?: StreamFilters
   onError?: (error: string) => void
   onConnectionChange?: (connected: boolean) => void
 }
 
 interface RealTimeEvent {
-  type: 'event' | 'connection' | 'pong'
+  type: 'event' | 'events' | 'summary' | 'lag' | 'subscribed' | 'error' | 'connection' | 'pong'
   id?: string
   project?: string
   level?: string
   message?: string
   timestamp?: number
   environment?: string
+  release?: string | null
   fingerprint?: string
   status?: string
+  error?: string
+  events?: RealTimeEvent[]
+}
+
+// Applied server-side; omitted fields match every event
+export interface StreamFilters {
+  level?: string[]
+  environment?: string[]
+  release?: string[]
+  fingerprint?: string[]
+  sample_rate?: number
+}
+
+// Sent when this connection's server-side send queue falls behind (lag_ms 0 once caught up)
+export interface StreamLag {
+  lag_ms: number
+  queued: number
+  dropped: number
+  dropped_levels: Record<string, number>
+}
+
+// Sent instead of individual events when the server coalesces a storm
+export interface EventSummary {
+  count: number
+  levels: Record<string, number>
+  since?: number
+  until?: number
 }
 
 interface UseWebSocketEventsReturn {
   isConnected: boolean
+  lag: StreamLag | null
   reconnect: () => void
   disconnect: () => void
 }
@@ -30,15 +61,31 @@ export const useWebSocketEvents = ({
   projectSlug,
   enabled,
   onNewEvent,
+  onSummary,
+  filters,
   onError,
   onConnectionChange
 }: WebSocketEventsOptions): UseWebSocketEventsReturn => {
   const wsRef = useRef<WebSocket | null>(null)
   const [isConnected, setIsConnected] = useState(false)
+  const [lag, setLag] = useState<StreamLag | null>(null)
   const reconnectAttemptRef = useRef(0)
   const maxReconnectAttempts = 5
   const reconnectTimeoutRef = useRef<NodeJS.Timeout>()
   const pingIntervalRef = useRef<NodeJS.Timeout>()
+  // null until the caller asks for server-side filtering
+  const filtersKey = filters ? JSON.stringify(filters) : null
+  const filtersKeyRef = useRef(filtersKey)
+  filtersKeyRef.current = filtersKey
+
+  const sendSubscribe = useCallback(() => {
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({
+        type: 'subscribe',
+        filters: JSON.parse(filtersKeyRef.current ?? '{}')
+      }))
+    }
+  }, [])
 
   const getWebSocketUrl = useCallback(() => {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
@@ -104,6 +151,9 @@ export const useWebSocketEvents = ({
         onConnectionChange?.(true)
         reconnectAttemptRef.current = 0
         startPingInterval()
+        if (filtersKeyRef.current !== null) {
+          sendSubscribe()
+        }
       }
 
       ws.onmessage = (event) => {
@@ -112,6 +162,15 @@ export const useWebSocketEvents = ({
           
           if (data.type === 'event') {
             onNewEvent(data)
+          } else if (data.type === 'events') {
+            data.events?.forEach(onNewEvent)
+          } else if (data.type === 'summary') {
+            onSummary?.(data as unknown as EventSummary)
+          } else if (data.type === 'lag') {
+            const report = data as unknown as StreamLag
+            setLag(report.lag_ms > 0 || report.dropped > 0 ? report : null)
+          } else if (data.type === 'error') {
+            onError?.(data.error || 'WebSocket subscription error')
           } else if (data.type === 'connection') {
             console.log(`[WebSocket] Connection confirmed for project: ${data.project}`)
           } else if (data.type === 'pong') {
@@ -156,7 +215,7 @@ export const useWebSocketEvents = ({
       console.error(`[WebSocket] ❌ Failed to create connection to ${getWebSocketUrl()}:`, error)
       onError?.('Failed to create WebSocket connection')
     }
-  }, [enabled, projectSlug, getWebSocketUrl, onNewEvent, onError, onConnectionChange, startPingInterval, cleanup])
+  }, [enabled, projectSlug, getWebSocketUrl, onNewEvent, onSummary, onError, onConnectionChange, startPingInterval, sendSubscribe, cleanup])
 
   const disconnect = useCallback(() => {
     cleanup()
@@ -176,8 +235,14 @@ export const useWebSocketEvents = ({
     return cleanup
   }, [connect, cleanup])
 
+  // Re-subscribe on the open socket when filters change
+  useEffect(() => {
+    sendSubscribe()
+  }, [filtersKey, sendSubscribe])
+
   return {
     isConnected,
+    lag,
     reconnect,
     disconnect
   }
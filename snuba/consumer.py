@@ -3,6 +3,7 @@ import time
 import json
 from datetime import datetime, timezone
 from kafka import KafkaConsumer
+import msgpack
 import clickhouse_connect
 from urllib.parse import urlparse
 
@@ -13,6 +14,26 @@ CLICKHOUSE_URL = os.environ.get("CLICKHOUSE_URL", "http://clickhouse:8123")
 CLICKHOUSE_DATABASE = os.environ.get("CLICKHOUSE_DATABASE", "sentry")
 
 
+# Values are either plain JSON or, from producers with KAFKA_ENCODING=msgpack,
+# a zero magic byte + schema version byte + msgpack body.
+MAGIC = 0
+SUPPORTED_SCHEMA_VERSIONS = {1}
+
+
+def decode_value(m):
+    try:
+        if m and m[0] == MAGIC:
+            version = m[1]
+            if version not in SUPPORTED_SCHEMA_VERSIONS:
+                print(f"Skipping record with unknown schema version {version}")
+                return None
+            return msgpack.unpackb(m[2:], raw=False)
+        return json.loads(m.decode("utf-8"))
+    except Exception as e:
+        print(f"Skipping undecodable record: {e}")
+        return None
+
+
 def ensure_table(client):
     client.command(f"CREATE DATABASE IF NOT EXISTS {CLICKHOUSE_DATABASE}")
     client.command(
@@ -24,11 +45,14 @@ def ensure_table(client):
             fingerprint String,
             title String,
             message String,
-            received_at DateTime
+            received_at DateTime,
+            sample_rate Float64 DEFAULT 1
         ) ENGINE = MergeTree()
         ORDER BY (project, received_at)
         """
     )
+    # Tables created before sampled events were published; each row counts 1 / sample_rate events
+    client.command(f"ALTER TABLE {CLICKHOUSE_DATABASE}.events ADD COLUMN IF NOT EXISTS sample_rate Float64 DEFAULT 1")
     client.command(
         f"""
         CREATE TABLE IF NOT EXISTS {CLICKHOUSE_DATABASE}.sessions (
@@ -54,7 +78,7 @@ def main():
             consumer = KafkaConsumer(
                 *KAFKA_TOPICS,
                 bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS.split(","),
-                value_deserializer=lambda m: json.loads(m.decode("utf-8")),
+                value_deserializer=decode_value,
                 auto_offset_reset="earliest",
                 enable_auto_commit=True,
                 group_id="snuba-consumer",
@@ -90,6 +114,8 @@ def main():
         for tp, batch in msgs.items():
             for msg in batch:
                 data = msg.value
+                if not isinstance(data, dict):
+                    continue
                 try:
                     if tp.topic.endswith('events'):
                         # Parse received_at to datetime
@@ -113,6 +139,7 @@ def main():
                                 data.get("title", ""),
                                 data.get("message", ""),
                                 dt,
+                                float(data.get("sample_rate") or 1.0),
                             ]
                         )
                     elif tp.topic.endswith('sessions'):
@@ -153,6 +180,7 @@ def main():
                     "title",
                     "message",
                     "received_at",
+                    "sample_rate",
                 ],
             )
         if session_rows: